@@ -26,11 +26,8 @@ struct DirectionalLight {
     vec3 specular;
 };
 
-uniform DirectionalLight u_dirLight;
-
 // Pointlight
 const int MAX_POINT_LIGHTS = 16;
-uniform int u_numPointLights;
 
 struct PointLight {
     vec3 position;
@@ -42,11 +39,8 @@ struct PointLight {
     float quadratic;
 };
 
-uniform PointLight u_pointLights[MAX_POINT_LIGHTS];
-
 // Spotlight
 const int MAX_SPOT_LIGHTS = 16;
-uniform int u_numSpotLights;
 
 struct SpotLight {
     vec3 position;
@@ -61,7 +55,15 @@ struct SpotLight {
     float outerCutOff;
 };
 
-uniform SpotLight u_spotLights[MAX_SPOT_LIGHTS];
+// Todas las luces en un uniform buffer compartido entre pipelines
+// (ver auxiliares/utils/light_buffer.py)
+layout(std140) uniform Lights {
+    DirectionalLight u_dirLight;
+    int u_numPointLights;
+    int u_numSpotLights;
+    PointLight u_pointLights[MAX_POINT_LIGHTS];
+    SpotLight u_spotLights[MAX_SPOT_LIGHTS];
+};
 
 vec3 computeDirectionalLight(vec3 normal, vec3 viewDir, DirectionalLight light) {
     //ambient
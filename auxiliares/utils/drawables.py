@@ -1,7 +1,8 @@
 import numpy as np
-from OpenGL.GL import glEnable, glDisable, glBindTexture, GL_TRIANGLES, GL_CULL_FACE, GL_TEXTURE_2D, GL_CLAMP_TO_EDGE, GL_LINEAR
+from OpenGL.GL import glEnable, glDisable, glBindTexture, glDeleteTextures, GL_TRIANGLES, GL_CULL_FACE, GL_TEXTURE_2D, GL_CLAMP_TO_EDGE, GL_LINEAR
 from PIL import Image
 from grafica.textures import texture_2D_setup
+from grafica.compressed_textures import compressed_texture_2D_setup
 import grafica.transformations as tr
 
 class Texture():
@@ -12,13 +13,20 @@ class Texture():
                  tWrapMode=GL_CLAMP_TO_EDGE,
                  minFilterMode=GL_LINEAR,
                  maxFilterMode=GL_LINEAR,
-                 flip_top_bottom=True):
+                 flip_top_bottom=True,
+                 mipmaps=None,
+                 anisotropy=1.0,
+                 max_size=None):
+        # mipmaps, anisotropy y max_size: ver grafica.textures.texture_2D_setup
         self.texture = None
         self.sWrapMode = sWrapMode
         self.tWrapMode = tWrapMode
         self.minFilterMode = minFilterMode
         self.maxFilterMode = maxFilterMode
         self.flip_top_bottom = flip_top_bottom
+        self.mipmaps = mipmaps
+        self.anisotropy = anisotropy
+        self.max_size = max_size
         self.width = 0
         self.height = 0
 
@@ -32,13 +40,18 @@ class Texture():
             
 
     def create_from_image(self, image):
-        self.texture = texture_2D_setup(image, self.sWrapMode, self.tWrapMode, self.minFilterMode, self.maxFilterMode, self.flip_top_bottom)
-
-    def create_from_file(self, path):
-        image = Image.open(path)
         self.width = image.size[0]
         self.height = image.size[1]
-        self.texture = texture_2D_setup(image, self.sWrapMode, self.tWrapMode, self.minFilterMode, self.maxFilterMode, self.flip_top_bottom)
+        self.texture = texture_2D_setup(image, self.sWrapMode, self.tWrapMode, self.minFilterMode, self.maxFilterMode, self.flip_top_bottom,
+                                        self.mipmaps, self.anisotropy, self.max_size)
+
+    def create_from_file(self, path):
+        if str(path).lower().endswith(".dds"):
+            # Textura comprimida, ver grafica.compressed_textures. Trae sus propios mipmaps
+            self.texture, self.width, self.height = compressed_texture_2D_setup(
+                path, self.sWrapMode, self.tWrapMode, self.minFilterMode, self.maxFilterMode, self.anisotropy)
+            return
+        self.create_from_image(Image.open(path))
 
     def bind(self):
         glBindTexture(GL_TEXTURE_2D, self.texture)
@@ -46,6 +59,11 @@ class Texture():
     def unbind(self):
         glBindTexture(GL_TEXTURE_2D, 0)
 
+    def delete(self):
+        if self.texture is not None:
+            glDeleteTextures(1, [self.texture])
+            self.texture = None
+
 class DirectionalLight():
     def __init__(self, diffuse = [1, 1, 1], specular = [1, 1, 1], ambient = [0.1, 0.1, 0.1]):
         self.diffuse = np.array(diffuse, dtype=np.float32)
@@ -117,9 +135,13 @@ class Model():
             glEnable(GL_CULL_FACE)
         else:
             glDisable(GL_CULL_FACE)
-        self.gpu_data.draw(mode)
+        self.draw_geometry(mode)
         glEnable(GL_CULL_FACE)
 
+    def draw_geometry(self, mode = GL_TRIANGLES):
+        # Sin tocar GL_CULL_FACE, quien llama se encarga del estado (ver SceneGraph.draw)
+        self.gpu_data.draw(mode)
+
 class Material():
     def __init__(self, ambient=[1, 1, 1], diffuse=[1, 1, 1], specular=[1, 1, 1], shininess=32.0):
         self.ambient = np.array(ambient, dtype=np.float32)
@@ -3,12 +3,19 @@ import trimesh as tm
 from OpenGL.GL import GL_LINES, GL_TRIANGLES
 import os
 from pathlib import Path
-from auxiliares.utils.drawables import Model, Texture
+from auxiliares.utils.drawables import Model
+from auxiliares.utils.texture_manager import texture_manager
 from trimesh.scene.scene import Scene
 from auxiliares.utils.scene_graph import SceneGraph 
 import auxiliares.utils.shapes as shapes
 
 import grafica.transformations as tr
+import grafica.basic_shapes as bs
+import grafica.mesh_cache as mc
+import numpy as np
+
+# Programas ya compilados, indexados por el código fuente de sus shaders
+_pipelines = {}
 
 def get_path(path):
     return os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), path)
@@ -20,7 +27,7 @@ def init_axis(controller):
     with open(Path(os.path.dirname(__file__)) / "../shaders/color.frag") as f:
         color_fragment_source_code = f.read()
 
-    color_pipeline = ShaderProgram(Shader(color_vertex_source_code, "vertex"), Shader(color_fragment_source_code, "fragment"))
+    color_pipeline = pipeline_from_source(color_vertex_source_code, color_fragment_source_code)
 
     axes = Model(shapes.Axes["position"])
     # axes.init_gpu_data()
@@ -39,39 +46,119 @@ def init_pipeline(vertex_source, fragment_source):
     with open(fragment_source) as f:
         fs = f.read()
 
-    pipeline = ShaderProgram(
-        Shader(vs, "vertex"),
-        Shader(fs, "fragment")
-    )
-
-    return pipeline
+    return pipeline_from_source(vs, fs)
+
+def pipeline_from_source(vs, fs):
+    # Crear el mismo pipeline dos veces entrega el mismo programa, sin recompilar
+    key = (vs, fs)
+    if key not in _pipelines:
+        _pipelines[key] = ShaderProgram(
+            Shader(vs, "vertex"),
+            Shader(fs, "fragment")
+        )
+
+    return _pipelines[key]
+
+def weld_vertex_data(indices, *attributes):
+    # Une los vértices con todos sus atributos iguales (posición, normal, uv),
+    # trimesh entrega tres vértices por cara en mallas grandes
+    columns = [np.asarray(data, dtype=np.float32).reshape(len(attributes[0]) // 3, -1) for data in attributes]
+    sizes = [column.shape[1] for column in columns]
+    welded = bs.weldVertices(bs.Shape(np.hstack(columns).reshape(-1), indices), sum(sizes))
+
+    rows = welded.vertices.reshape(-1, sum(sizes))
+    splits = np.split(rows, np.cumsum(sizes)[:-1], axis=1)
+    return welded.indices, [split.reshape(-1) for split in splits]
+
+def mesh_data_from_cache(arrays):
+    ids = dict.fromkeys(name.rsplit("/", 1)[0] for name in arrays)
+    return [{
+        "id": id,
+        "positions": arrays[f"{id}/positions"],
+        "uvs": arrays.get(f"{id}/uvs"),
+        "normals": arrays[f"{id}/normals"],
+        "indices": arrays[f"{id}/indices"],
+        "image": None,
+        "saved_bytes": int(arrays[f"{id}/saved_bytes"][0])
+    } for id in ids]
+
+def load_mesh_data(path, weld=False, cache=True):
+    # Lee el archivo y prepara los datos de cada mesh sin usar OpenGL,
+    # por lo que puede ejecutarse en otro thread (ver auxiliares.utils.loader)
+
+    # Las mallas sin imagen de textura se guardan en un caché binario junto al
+    # archivo (ver grafica.mesh_cache), así las siguientes ejecuciones no usan
+    # trimesh. v2: también guarda las uvs, los cachés anteriores no las tenían
+    variant = "trimesh-weld-v2" if weld else "trimesh-v2"
+    if cache:
+        arrays = mc.load(path, variant)
+        if arrays is not None:
+            return mesh_data_from_cache(arrays)
 
-def mesh_from_file(path):
     mesh_data = tm.load(path)
     mesh_data.apply_transform(tr.uniformScale(2.0 / mesh_data.scale) @ tr.translate(*-mesh_data.centroid))
 
-    mesh_list = []
+    data_list = []
+    cache_arrays = {}
 
     def process_geometry(id, geometry):
         vertex_data = tm.rendering.mesh_to_vertexlist(geometry)
         indices = vertex_data[3]
         positions = vertex_data[4][1]
         uvs = None
-        texture = None
+        image = None
         normals = vertex_data[5][1]
 
         if geometry.visual.kind == "texture":
-            texture = Texture()
             uvs = vertex_data[6][1]
-            texture.create_from_image(geometry.visual.material.image)
-
-        model = Model(positions, uvs, normals, indices)
-        return {"id": id, "mesh": model, "texture": texture}
+            image = geometry.visual.material.image
+
+        # Memoria ahorrada al unir vértices, en bytes
+        saved_bytes = 0
+        if weld:
+            attributes = [positions, normals] if uvs is None else [positions, normals, uvs]
+            size = len(indices) + sum(len(data) for data in attributes)
+            indices, attributes = weld_vertex_data(indices, *attributes)
+            saved_bytes = 4 * (size - len(indices) - sum(len(data) for data in attributes))
+
+            positions, normals = attributes[:2]
+            if uvs is not None:
+                uvs = attributes[2]
+
+        if image is None:
+            cache_arrays[f"{id}/positions"] = np.asarray(positions, dtype=np.float32)
+            cache_arrays[f"{id}/normals"] = np.asarray(normals, dtype=np.float32)
+            cache_arrays[f"{id}/indices"] = np.asarray(indices, dtype=np.uint32)
+            if uvs is not None:
+                cache_arrays[f"{id}/uvs"] = np.asarray(uvs, dtype=np.float32)
+            cache_arrays[f"{id}/saved_bytes"] = np.array([saved_bytes], dtype=np.int64)
+
+        return {"id": id, "positions": positions, "uvs": uvs, "normals": normals, "indices": indices,
+                "image": image, "saved_bytes": saved_bytes}
 
     if type(mesh_data) is Scene:
         for id, geometry in mesh_data.geometry.items():
-            mesh_list.append(process_geometry(id, geometry))
+            data_list.append(process_geometry(id, geometry))
     else:
-        mesh_list.append(process_geometry("model", mesh_data))
+        data_list.append(process_geometry("model", mesh_data))
+
+    if cache and all(data["image"] is None for data in data_list):
+        mc.store(path, variant, cache_arrays)
+
+    return data_list
+
+def mesh_from_data(data_list):
+    # Crea los modelos y las texturas, debe ejecutarse en el thread de OpenGL
+    mesh_list = []
+    for data in data_list:
+        texture = None
+        if data["image"] is not None:
+            texture = texture_manager.acquire(image=data["image"])
+
+        model = Model(data["positions"], data["uvs"], data["normals"], data["indices"])
+        mesh_list.append({"id": data["id"], "mesh": model, "texture": texture, "saved_bytes": data["saved_bytes"]})
 
     return mesh_list
+
+def mesh_from_file(path, weld=False, cache=True):
+    return mesh_from_data(load_mesh_data(path, weld, cache))
@@ -0,0 +1,117 @@
+import numpy as np
+from OpenGL.GL import glGenBuffers, glBindBuffer, glBufferData, glBufferSubData, glBindBufferBase, GL_UNIFORM_BUFFER, GL_DYNAMIC_DRAW
+
+# Luces de la escena en un uniform buffer (layout std140), uno por cada
+# pipeline que declara el bloque "Lights", con las luces que lo incluyen en
+# su lista de pipelines. Por ejemplo auxiliares/shaders/color_mesh_lit.frag:
+#
+#   layout(std140) uniform Lights {
+#       DirectionalLight u_dirLight;
+#       int u_numPointLights;
+#       int u_numSpotLights;
+#       PointLight u_pointLights[MAX_POINT_LIGHTS];
+#       SpotLight u_spotLights[MAX_SPOT_LIGHTS];
+#   };
+#
+# Los dtypes siguen las reglas de std140: un vec3 se alinea a 16 bytes pero
+# ocupa 12, así que un float siguiente usa los 4 restantes, y cada struct
+# ocupa un múltiplo de 16 bytes.
+
+MAX_POINT_LIGHTS = 16
+MAX_SPOT_LIGHTS = 16
+
+_vec3 = (np.float32, 3)
+
+DIRECTIONAL_LIGHT = np.dtype({
+    "names": ["direction", "ambient", "diffuse", "specular"],
+    "formats": [_vec3, _vec3, _vec3, _vec3],
+    "offsets": [0, 16, 32, 48],
+    "itemsize": 64})
+
+POINT_LIGHT = np.dtype({
+    "names": ["position", "ambient", "diffuse", "specular", "constant", "linear", "quadratic"],
+    "formats": [_vec3, _vec3, _vec3, _vec3, np.float32, np.float32, np.float32],
+    "offsets": [0, 16, 32, 48, 60, 64, 68],
+    "itemsize": 80})
+
+SPOT_LIGHT = np.dtype({
+    "names": ["position", "direction", "ambient", "diffuse", "specular", "constant", "linear", "quadratic", "cutOff", "outerCutOff"],
+    "formats": [_vec3, _vec3, _vec3, _vec3, _vec3, np.float32, np.float32, np.float32, np.float32, np.float32],
+    "offsets": [0, 16, 32, 48, 64, 76, 80, 84, 88, 92],
+    "itemsize": 96})
+
+LIGHTS_BLOCK = np.dtype({
+    "names": ["u_dirLight", "u_numPointLights", "u_numSpotLights", "u_pointLights", "u_spotLights"],
+    "formats": [DIRECTIONAL_LIGHT, np.int32, np.int32, (POINT_LIGHT, MAX_POINT_LIGHTS), (SPOT_LIGHT, MAX_SPOT_LIGHTS)],
+    "offsets": [0, 64, 68, 80, 80 + MAX_POINT_LIGHTS * 80],
+    "itemsize": 80 + MAX_POINT_LIGHTS * 80 + MAX_SPOT_LIGHTS * 96})
+
+class LightBuffer():
+    def __init__(self):
+        self.data = np.zeros((), dtype=LIGHTS_BLOCK)
+        self.next = np.zeros((), dtype=LIGHTS_BLOCK)
+        self.ubo = None
+
+    # En cada frame: begin(), set_* por cada luz, upload() y bind() al usar el pipeline
+
+    def begin(self):
+        self.next = np.zeros((), dtype=LIGHTS_BLOCK)
+
+    def set_directional(self, direction, light):
+        record = self.next["u_dirLight"]
+        record["direction"] = direction
+        record["ambient"] = light.ambient
+        record["diffuse"] = light.diffuse
+        record["specular"] = light.specular
+
+    def set_point(self, position, light):
+        # Cada luz ocupa el siguiente índice libre
+        index = int(self.next["u_numPointLights"])
+        record = self.next["u_pointLights"][index]
+        record["position"] = position
+        record["ambient"] = light.ambient
+        record["diffuse"] = light.diffuse
+        record["specular"] = light.specular
+        record["constant"] = light.constant
+        record["linear"] = light.linear
+        record["quadratic"] = light.quadratic
+        self.next["u_numPointLights"] = index + 1
+
+    def set_spot(self, position, direction, light):
+        index = int(self.next["u_numSpotLights"])
+        record = self.next["u_spotLights"][index]
+        record["position"] = position
+        record["direction"] = direction
+        record["ambient"] = light.ambient
+        record["diffuse"] = light.diffuse
+        record["specular"] = light.specular
+        record["constant"] = light.constant
+        record["linear"] = light.linear
+        record["quadratic"] = light.quadratic
+        record["cutOff"] = light.cutOff
+        record["outerCutOff"] = light.outerCutOff
+        self.next["u_numSpotLights"] = index + 1
+
+    def upload(self):
+        # Solo se escribe el buffer si alguna luz cambió desde el frame anterior
+        # Retorna True si se escribió
+        if self.ubo is None:
+            self.ubo = glGenBuffers(1)
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, LIGHTS_BLOCK.itemsize, self.next.tobytes(), GL_DYNAMIC_DRAW)
+        elif self.next.tobytes() != self.data.tobytes():
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferSubData(GL_UNIFORM_BUFFER, 0, LIGHTS_BLOCK.itemsize, self.next.tobytes())
+        else:
+            return False
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.data = self.next
+        return True
+
+    def bind(self, pipeline):
+        # pyglet asigna el mismo binding a los bloques con el mismo nombre, así
+        # que el buffer de otro pipeline puede estar enlazado ahí: se enlaza siempre
+        glBindBufferBase(GL_UNIFORM_BUFFER, pipeline.uniform_blocks["Lights"].binding, self.ubo)
+
+def uses_light_buffer(pipeline):
+    return "Lights" in getattr(pipeline, "uniform_blocks", {})
@@ -0,0 +1,88 @@
+import concurrent.futures as futures
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from PIL import Image
+
+from auxiliares.utils.texture_manager import texture_manager
+from auxiliares.utils.helpers import load_mesh_data, mesh_from_data
+
+# Carga de assets en paralelo.
+# Leer archivos y decodificar mallas e imágenes ocurre en un pool de threads,
+# mientras que crear texturas y modelos se hace en el thread de OpenGL,
+# al llamar a update() o wait().
+# PIL y numpy liberan el GIL al decodificar, pero parte del parser de trimesh
+# es Python puro: con processes=True se usa un pool de procesos, conveniente
+# cuando hay muchas mallas que no están en el caché (ver grafica.mesh_cache).
+#
+#   loader = AssetLoader(progress=lambda done, total: print(f"{done}/{total}"))
+#   zorzal = loader.load_mesh("assets/zorzal.obj")
+#   bricks = loader.load_texture("assets/bricks.jpg")
+#   loader.wait()
+#   graph.add_node("zorzal", mesh=zorzal.result()[0]["mesh"], ...)
+#
+# En vez de wait() se puede llamar a update() en cada frame, por ejemplo
+# para dibujar una pantalla de carga mientras tanto.
+
+def decode_image(path):
+    if str(path).lower().endswith(".dds"):
+        # Las texturas comprimidas se suben sin decodificar
+        return None
+    image = Image.open(path)
+    image.load()
+    return image
+
+class AssetLoader():
+    def __init__(self, max_workers=None, progress=None, processes=False):
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.progress = progress
+        self.pending = []
+        self.total = 0
+        self.done = 0
+
+    def submit(self, decode, create):
+        # decode se ejecuta en el pool, create(resultado) en el thread de OpenGL
+        # Entrega un Future con el resultado de create
+        result = Future()
+        self.pending.append((self.executor.submit(decode), create, result))
+        self.total += 1
+        return result
+
+    def load_mesh(self, path, weld=False, cache=True):
+        return self.submit(partial(load_mesh_data, path, weld, cache), mesh_from_data)
+
+    def load_texture(self, path, **kwargs):
+        # Las texturas vienen de texture_manager: liberarlas con texture_manager.release
+        return self.submit(partial(decode_image, path), lambda image: texture_manager.acquire(path, image, **kwargs))
+
+    def update(self):
+        # Crea los assets ya decodificados, sin esperar a los demás
+        # Retorna True cuando no queda nada pendiente
+        pending = []
+        for decoded, create, result in self.pending:
+            if not decoded.done():
+                pending.append((decoded, create, result))
+                continue
+            self.finish(decoded, create, result)
+        self.pending = pending
+        return not self.pending
+
+    def wait(self):
+        # Crea todos los assets, a medida que terminan de decodificarse
+        while not self.update():
+            futures.wait([decoded for decoded, _, _ in self.pending], return_when=futures.FIRST_COMPLETED)
+
+    def finish(self, decoded, create, result):
+        try:
+            result.set_result(create(decoded.result()))
+        except Exception as error:
+            result.set_exception(error)
+
+        self.done += 1
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
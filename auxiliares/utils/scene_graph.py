@@ -1,11 +1,13 @@
 from networkx import DiGraph, edge_dfs
-from OpenGL.GL import GL_TRIANGLES
+from OpenGL.GL import GL_TRIANGLES, GL_CULL_FACE, glEnable, glDisable
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname((os.path.dirname(__file__)))))
 import grafica.transformations as tr
 import numpy as np
-from auxiliares.utils.drawables import DirectionalLight, PointLight, SpotLight, Texture
+from auxiliares.utils.drawables import DirectionalLight, PointLight, SpotLight
+from auxiliares.utils.texture_manager import texture_manager
+from auxiliares.utils.light_buffer import LightBuffer, uses_light_buffer
 
 class SceneGraph():
     def __init__(self, camera = None):
@@ -15,6 +17,8 @@ class SceneGraph():
         self.num_spot_lights = 0
         self.transformations = {}
         self.camera = camera
+        # Buffer de luces de cada pipeline con el bloque "Lights"
+        self.light_buffers = {}
 
     def add_node(self,
                  name,
@@ -30,7 +34,8 @@ class SceneGraph():
                  rotation=[0, 0, 0],
                  scale=[1, 1, 1],
                  mode=GL_TRIANGLES,
-                 cull_face=True):
+                 cull_face=True,
+                 keep_order=False):
         if pipeline is None and mesh is not None:
             raise ValueError("Definir pipeline para un mesh")
         
@@ -41,7 +46,10 @@ class SceneGraph():
         if mesh is not None:
             mesh.init_gpu_data(pipeline)
             if texture is None:
-                _texture = Texture()
+                # Todos los meshes sin textura comparten la misma textura blanca
+                _texture = texture_manager.white()
+            elif texture_manager.manages(texture):
+                texture_manager.retain(texture)
 
         if light is not None and isinstance(light, PointLight):
             if self.num_point_lights == 16:
@@ -66,12 +74,16 @@ class SceneGraph():
             rotation=np.array(rotation, dtype=np.float32),
             scale=np.array(scale, dtype=np.float32),
             mode=mode,
-            cull_face=cull_face)
+            cull_face=cull_face,
+            keep_order=keep_order)
         
         self.graph.add_edge(attach_to, name)
 
     def remove_node(self, name):
         if name in self.graph.nodes:
+            texture = self.graph.nodes[name]["texture"]
+            if self.graph.nodes[name]["mesh"] is not None and texture_manager.manages(texture):
+                texture_manager.release(texture)
             self.graph.remove_node(name)
 
     def __getitem__(self, name):
@@ -112,10 +124,24 @@ class SceneGraph():
                 self.transformations[dst] = self.transformations[src] @ self.get_transform(dst)
 
     def draw(self):
+        """
+        Los meshes se dibujan ordenados por pipeline, textura, material y
+        cull_face, en vez del orden del grafo, para cambiar de estado lo menos
+        posible. Los nodos agregados con keep_order=True (por ejemplo, meshes
+        transparentes o que dependen de lo ya dibujado) se dibujan después,
+        en el orden del grafo.
+        """
         root_key = self.graph.graph["root"]
         edges = list(edge_dfs(self.graph, source=root_key))
         pointLightIndex = 0
         spotLightIndex = 0
+        # Meshes a dibujar, después de configurar las luces
+        render_queue = []
+        ordered_queue = []
+        # Orden de primera aparición en este frame de cada pipeline, textura y material
+        ordinals = {}
+        # Buffers de luces usados en este frame
+        frame_light_buffers = {}
 
         for src, dst in edges:
             current_node = self.graph.nodes[dst]
@@ -132,42 +158,52 @@ class SceneGraph():
                 if not isinstance(current_pipeline, list):
                     current_pipelines = [current_pipeline]
 
+                light = current_node["light"]
+                position = (self.transformations[src] @ np.array([current_node["position"][0], current_node["position"][1], current_node["position"][2], 1], dtype=np.float32))[:3]
+                direction = (self.transformations[src] @ self.get_forward(dst))[:3]
+
+                # Los pipelines con el bloque "Lights" reciben la luz en su buffer, el resto como uniforms sueltos
                 for pipeline in current_pipelines:
+                    if uses_light_buffer(pipeline):
+                        light_buffer = self._frame_light_buffer(pipeline, frame_light_buffers)
+                        if isinstance(light, DirectionalLight):
+                            light_buffer.set_directional(direction, light)
+                        elif isinstance(light, PointLight):
+                            light_buffer.set_point(position, light)
+                        elif isinstance(light, SpotLight):
+                            light_buffer.set_spot(position, direction, light)
+                        continue
                     pipeline.use()
-                    if "u_viewPos" in pipeline.uniforms:
-                        pipeline["u_viewPos"] = self.camera.position[:3]
-                    if isinstance(current_node["light"], DirectionalLight):
+                    if isinstance(light, DirectionalLight):
                         if "u_dirLight.direction" in pipeline.uniforms:
-                            pipeline["u_dirLight.direction"] = (self.transformations[src] @ self.get_forward(dst))[:3]
-                            pipeline["u_dirLight.ambient"] = current_node["light"].ambient
-                            pipeline["u_dirLight.diffuse"] = current_node["light"].diffuse
-                            pipeline["u_dirLight.specular"] = current_node["light"].specular
-                    elif isinstance(current_node["light"], PointLight):
+                            pipeline["u_dirLight.direction"] = direction
+                            pipeline["u_dirLight.ambient"] = light.ambient
+                            pipeline["u_dirLight.diffuse"] = light.diffuse
+                            pipeline["u_dirLight.specular"] = light.specular
+                    elif isinstance(light, PointLight):
                         if "u_numPointLights" in pipeline.uniforms:
                             pipeline["u_numPointLights"] = self.num_point_lights
-                            position = (self.transformations[src] @ np.array([current_node["position"][0], current_node["position"][1], current_node["position"][2], 1], dtype=np.float32))[:3]
                             pipeline[f"u_pointLights[{str(pointLightIndex)}].position"] = position
-                            pipeline[f"u_pointLights[{str(pointLightIndex)}].ambient"] = current_node["light"].ambient
-                            pipeline[f"u_pointLights[{str(pointLightIndex)}].diffuse"] = current_node["light"].diffuse
-                            pipeline[f"u_pointLights[{str(pointLightIndex)}].specular"] = current_node["light"].specular
-                            pipeline[f"u_pointLights[{str(pointLightIndex)}].constant"] = current_node["light"].constant
-                            pipeline[f"u_pointLights[{str(pointLightIndex)}].linear"] = current_node["light"].linear
-                            pipeline[f"u_pointLights[{str(pointLightIndex)}].quadratic"] = current_node["light"].quadratic
-
-                    elif isinstance(current_node["light"], SpotLight):
+                            pipeline[f"u_pointLights[{str(pointLightIndex)}].ambient"] = light.ambient
+                            pipeline[f"u_pointLights[{str(pointLightIndex)}].diffuse"] = light.diffuse
+                            pipeline[f"u_pointLights[{str(pointLightIndex)}].specular"] = light.specular
+                            pipeline[f"u_pointLights[{str(pointLightIndex)}].constant"] = light.constant
+                            pipeline[f"u_pointLights[{str(pointLightIndex)}].linear"] = light.linear
+                            pipeline[f"u_pointLights[{str(pointLightIndex)}].quadratic"] = light.quadratic
+
+                    elif isinstance(light, SpotLight):
                         if "u_numSpotLights" in pipeline.uniforms:
                             pipeline["u_numSpotLights"] = self.num_spot_lights
-                            position = (self.transformations[src] @ np.array([current_node["position"][0], current_node["position"][1], current_node["position"][2], 1], dtype=np.float32))[:3]
                             pipeline[f"u_spotLights[{str(spotLightIndex)}].position"] = position
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].direction"] = (self.transformations[src] @ self.get_forward(dst))[:3]
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].ambient"] = current_node["light"].ambient
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].diffuse"] = current_node["light"].diffuse
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].specular"] = current_node["light"].specular
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].constant"] = current_node["light"].constant
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].linear"] = current_node["light"].linear
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].quadratic"] = current_node["light"].quadratic
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].cutOff"] = current_node["light"].cutOff
-                            pipeline[f"u_spotLights[{str(spotLightIndex)}].outerCutOff"] = current_node["light"].outerCutOff
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].direction"] = direction
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].ambient"] = light.ambient
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].diffuse"] = light.diffuse
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].specular"] = light.specular
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].constant"] = light.constant
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].linear"] = light.linear
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].quadratic"] = light.quadratic
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].cutOff"] = light.cutOff
+                            pipeline[f"u_spotLights[{str(spotLightIndex)}].outerCutOff"] = light.outerCutOff
 
                 if isinstance(current_node["light"], PointLight):
                     pointLightIndex += 1
@@ -176,47 +212,112 @@ class SceneGraph():
 
                 continue
 
-            current_pipeline.use()
-            """ 
-            Setup de cámara 
-            """
-            if self.camera is not None:
+            if current_node["mesh"] is not None:
+                if uses_light_buffer(current_pipeline):
+                    # También sin luces, para no usar las del frame anterior
+                    self._frame_light_buffer(current_pipeline, frame_light_buffers)
+                textured = "u_texture" in current_pipeline.uniforms and current_node["texture"] is not None
+                texture = current_node["texture"] if textured else None
+                if current_node["keep_order"]:
+                    ordered_queue.append((None, dst, current_node, texture))
+                    continue
+                # Ordenados por estado, así los cambios de estado ocurren solo cuando difiere.
+                # Nodos con el mismo estado mantienen el orden del grafo, y el orden
+                # entre estados no depende de las direcciones en memoria (id)
+                key = (
+                    ordinals.setdefault(id(current_pipeline), len(ordinals)),
+                    ordinals.setdefault(id(texture), len(ordinals)),
+                    ordinals.setdefault(id(current_node["material"]), len(ordinals)),
+                    current_node["cull_face"],
+                    len(render_queue))
+                render_queue.append((key, dst, current_node, texture))
 
-                if "u_view" in current_pipeline.uniforms:
-                    current_pipeline["u_view"] = self.camera.get_view()
+        render_queue.sort(key=lambda item: item[0])
+        render_queue.extend(ordered_queue)
+        for light_buffer in frame_light_buffers.values():
+            light_buffer.upload()
 
-                if "u_projection" in current_pipeline.uniforms:
-                    current_pipeline["u_projection"] = self.camera.get_projection()
+        view = projection = None
+        if self.camera is not None:
+            view = self.camera.get_view()
+            projection = self.camera.get_projection()
 
-            if current_node["mesh"] is not None:
-                """
-                Setup de Material
+        current_pipeline = None
+        current_material = None
+        bound_texture = None
+        cull_face = None
+
+        for _, dst, current_node, texture in render_queue:
+            if current_node["pipeline"] is not current_pipeline:
+                current_pipeline = current_node["pipeline"]
+                current_material = None
+                current_pipeline.use()
+                """ 
+                Setup de cámara, una vez por pipeline
                 """
-                if "u_color" in current_pipeline.uniforms:
-                    current_pipeline["u_color"] = np.array(current_node["color"], dtype=np.float32)
+                if self.camera is not None:
+                    if "u_view" in current_pipeline.uniforms:
+                        current_pipeline["u_view"] = view
+
+                    if "u_projection" in current_pipeline.uniforms:
+                        current_pipeline["u_projection"] = projection
+
+                    if "u_viewPos" in current_pipeline.uniforms:
+                        current_pipeline["u_viewPos"] = self.camera.position[:3]
+
+                if uses_light_buffer(current_pipeline):
+                    frame_light_buffers[current_pipeline].bind(current_pipeline)
 
-                if "u_material.diffuse" in current_pipeline.uniforms:
-                    material = current_node["material"]
-                    if material is None:
-                        raise ValueError("Material es None")
+            """
+            Setup de Material
+            """
+            if "u_color" in current_pipeline.uniforms:
+                current_pipeline["u_color"] = np.array(current_node["color"], dtype=np.float32)
+
+            if "u_material.diffuse" in current_pipeline.uniforms:
+                material = current_node["material"]
+                if material is None:
+                    raise ValueError("Material es None")
+                if material is not current_material:
                     current_pipeline["u_material.diffuse"] = material.diffuse
                     current_pipeline["u_material.ambient"] = material.ambient
                     current_pipeline["u_material.specular"] = material.specular
                     current_pipeline["u_material.shininess"] = material.shininess
+                    current_material = material
 
-                textured = "u_texture" in current_pipeline.uniforms and current_node["texture"] is not None
-                if textured:
-                    current_node["texture"].bind()
+            if texture is not None and texture is not bound_texture:
+                texture.bind()
+                bound_texture = texture
+
+            if current_node["cull_face"] != cull_face:
+                cull_face = current_node["cull_face"]
+                if cull_face:
+                    glEnable(GL_CULL_FACE)
+                else:
+                    glDisable(GL_CULL_FACE)
+
+            """
+            Setup de Mesh
+            """
+            current_pipeline["u_model"] = np.reshape(self.transformations[dst], (16, 1), order="F")
+            current_node["mesh"].draw_geometry(current_node["mode"])
+
+        if bound_texture is not None:
+            bound_texture.unbind()
+        glEnable(GL_CULL_FACE)
+
+    def _frame_light_buffer(self, pipeline, frame_light_buffers):
+        # Buffer de luces del pipeline, vaciado la primera vez que se usa en el frame
+        light_buffer = frame_light_buffers.get(pipeline)
+        if light_buffer is None:
+            light_buffer = self.light_buffers.get(pipeline)
+            if light_buffer is None:
+                light_buffer = LightBuffer()
+                self.light_buffers[pipeline] = light_buffer
+            light_buffer.begin()
+            frame_light_buffers[pipeline] = light_buffer
+        return light_buffer
 
-                """
-                Setup de Mesh
-                """                
-                current_pipeline["u_model"] = np.reshape(self.transformations[dst], (16, 1), order="F")
-                current_node["mesh"].draw(current_node["mode"], current_node["cull_face"])
-
-                if textured:
-                    current_node["texture"].unbind()
-            
     def find_position(self, node_name):
         for src, dst in self.transformations.items():
             if src == node_name:
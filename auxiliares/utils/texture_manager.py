@@ -0,0 +1,96 @@
+import hashlib
+import os
+import numpy as np
+from PIL import Image
+
+from auxiliares.utils.drawables import Texture
+
+# Texturas compartidas con conteo de referencias.
+# Una imagen se sube a la GPU una sola vez por cada combinación de parámetros
+# (wrap, filtros, mipmaps, etc.), aunque se cargue varias veces o desde
+# archivos distintos con el mismo contenido. Cada acquire() debe tener su
+# release(); con la última se borra la textura de la GPU.
+#
+#   bricks = texture_manager.acquire("assets/bricks.jpg")
+#   otra = texture_manager.acquire("assets/bricks.jpg")   # misma textura
+#   texture_manager.release(otra)
+#   texture_manager.release(bricks)                       # glDeleteTextures
+#
+# SceneGraph toma su propia referencia de las texturas del manager que usan
+# sus nodos y la libera en remove_node.
+
+WHITE = Image.fromarray(np.array([[[255, 255, 255, 255]]], dtype=np.uint8))
+
+def image_hash(image):
+    # Hash de los pixeles, no del archivo: dos formatos con la misma imagen comparten textura
+    digest = hashlib.sha1(f"{image.mode} {image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+class TextureManager():
+    def __init__(self):
+        self.textures = {}    # (hash, parámetros) -> Texture
+        self.references = {}  # id(Texture) -> [clave, referencias]
+        self.paths = {}       # (ruta, mtime, tamaño, parámetros) -> clave
+
+    def acquire(self, path=None, image=None, **kwargs):
+        # Mismos argumentos que Texture. Con path e image, la ruta solo se usa
+        # para reconocer la imagen la próxima vez sin decodificarla
+        params = tuple(sorted(kwargs.items()))
+
+        path_key = None
+        if path is not None:
+            stat = os.stat(path)
+            path_key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size, params)
+            key = self.paths.get(path_key)
+            if key is not None:
+                return self.retain(self.textures[key])
+            if image is None and str(path).lower().endswith(".dds"):
+                # Las texturas comprimidas se suben tal cual, sin decodificarlas
+                with open(path, "rb") as f:
+                    key = (hashlib.sha1(f.read()).hexdigest(), params)
+            elif image is None:
+                image = Image.open(path)
+        elif image is None:
+            image = WHITE
+
+        if image is not None:
+            key = (image_hash(image), params)
+        if path_key is not None:
+            self.paths[path_key] = key
+
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = Texture(image=image, **kwargs) if image is not None else Texture(path, **kwargs)
+            self.textures[key] = texture
+            self.references[id(texture)] = [key, 0]
+        return self.retain(texture)
+
+    def white(self):
+        # Textura blanca de 1x1, la que usan los meshes sin textura
+        return self.acquire(image=WHITE)
+
+    def manages(self, texture):
+        return texture is not None and id(texture) in self.references
+
+    def retain(self, texture):
+        self.references[id(texture)][1] += 1
+        return texture
+
+    def release(self, texture):
+        entry = self.references[id(texture)]
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+
+        key = entry[0]
+        del self.references[id(texture)]
+        del self.textures[key]
+        self.paths = {path_key: value for path_key, value in self.paths.items() if value != key}
+        texture.delete()
+
+    def memory_size(self):
+        # Bytes de las texturas subidas, sin contar mipmaps
+        return sum(texture.width * texture.height * 4 for texture in self.textures.values())
+
+texture_manager = TextureManager()
@@ -15,7 +15,8 @@ import auxiliares.utils.shapes as shapes
 from auxiliares.utils.camera import FreeCamera
 from auxiliares.utils.scene_graph import SceneGraph
 from auxiliares.utils.drawables import Model, Texture, DirectionalLight, PointLight, SpotLight, Material
-from auxiliares.utils.helpers import init_axis, init_pipeline, mesh_from_file, get_path
+from auxiliares.utils.helpers import init_axis, init_pipeline, get_path
+from auxiliares.utils.loader import AssetLoader
 
 WIDTH = 640
 HEIGHT = 640
@@ -70,11 +71,23 @@ if __name__ == "__main__":
     pyramid = Model(shapes.SquarePyramid["position"], shapes.SquarePyramid["uv"], shapes.SquarePyramid["normal"], index_data=shapes.SquarePyramid["indices"])
     triangle = Model(shapes.Triangle["position"], shapes.Triangle["uv"], shapes.Triangle["normal"])
     quad = Model(shapes.Square["position"], shapes.Square["uv"], shapes.Square["normal"], index_data=shapes.Square["indices"])
-    arrow = mesh_from_file("assets/arrow.off")[0]["mesh"]
 
-    bricks = Texture("assets/bricks.jpg")
-    wall2 = Texture("assets/wall2.jpg")
-    boo = Texture("assets/boo.png", maxFilterMode=GL.GL_NEAREST)
+    # Los archivos se leen en paralelo, los modelos y texturas se crean en loader.wait()
+    loader = AssetLoader()
+    arrow_asset = loader.load_mesh("assets/arrow.off")
+    zorzal_asset = loader.load_mesh("assets/zorzal.obj")
+    auto_asset = loader.load_mesh("assets/auto.off")
+    bricks_asset = loader.load_texture("assets/bricks.jpg")
+    wall2_asset = loader.load_texture("assets/wall2.jpg")
+    boo_asset = loader.load_texture("assets/boo.png", maxFilterMode=GL.GL_NEAREST)
+    loader.wait()
+    loader.shutdown()
+
+    arrow = arrow_asset.result()[0]["mesh"]
+
+    bricks = bricks_asset.result()
+    wall2 = wall2_asset.result()
+    boo = boo_asset.result()
 
     graph = SceneGraph(controller)
 
@@ -121,9 +134,9 @@ if __name__ == "__main__":
 
     graph.add_node("shapes")
 
-    # mesh_from_file() devuelve una lista de diccionarios, cada uno con la información de un mesh
+    # load_mesh() entrega una lista de diccionarios, cada uno con la información de un mesh
     # [{id, mesh, texture}, ...]
-    zorzal = mesh_from_file("assets/zorzal.obj")
+    zorzal = zorzal_asset.result()
     graph.add_node("zorzal")
     for i in range(len(zorzal)):
         graph.add_node(zorzal[i]["id"],
@@ -134,7 +147,7 @@ if __name__ == "__main__":
                     texture=zorzal[i]["texture"],
                     cull_face=False)
         
-    auto = mesh_from_file("assets/auto.off")
+    auto = auto_asset.result()
     graph.add_node(auto[0]["id"],
                 attach_to="root",
                 mesh=auto[0]["mesh"],
@@ -17,7 +17,8 @@ import auxiliares.utils.shapes as shapes
 from auxiliares.utils.camera import FreeCamera
 from auxiliares.utils.scene_graph import SceneGraph
 from auxiliares.utils.drawables import Model, Texture, DirectionalLight, PointLight, SpotLight, Material
-from auxiliares.utils.helpers import init_axis, init_pipeline, mesh_from_file, get_path
+from auxiliares.utils.helpers import init_axis, init_pipeline, get_path
+from auxiliares.utils.loader import AssetLoader
 
 WIDTH = 640
 HEIGHT = 640
@@ -84,10 +85,21 @@ if __name__ == "__main__":
     cube = Model(shapes.Cube["position"], shapes.Cube["uv"], shapes.Cube["normal"], index_data=shapes.Cube["indices"])
     pyramid = Model(shapes.SquarePyramid["position"], shapes.SquarePyramid["uv"], shapes.SquarePyramid["normal"], index_data=shapes.SquarePyramid["indices"])
     quad = Model(shapes.Square["position"], shapes.Square["uv"], shapes.Square["normal"], index_data=shapes.Square["indices"])
-    sphere = mesh_from_file("assets/sphere.off")[0]["mesh"]
 
-    bricks = Texture("assets/bricks.jpg")
-    wall2 = Texture("assets/wall2.jpg")
+    # Los archivos se leen en paralelo, los modelos y texturas se crean en loader.wait()
+    loader = AssetLoader()
+    sphere_asset = loader.load_mesh("assets/sphere.off")
+    zorzal_asset = loader.load_mesh("assets/zorzal.obj")
+    bricks_asset = loader.load_texture("assets/bricks.jpg")
+    # El piso se ve reducido y en ángulo rasante: mipmaps con filtrado trilineal y anisotrópico
+    wall2_asset = loader.load_texture("assets/wall2.jpg", minFilterMode=GL.GL_LINEAR_MIPMAP_LINEAR, anisotropy=8)
+    loader.wait()
+    loader.shutdown()
+
+    sphere = sphere_asset.result()[0]["mesh"]
+
+    bricks = bricks_asset.result()
+    wall2 = wall2_asset.result()
 
     graph = SceneGraph(controller)
 
@@ -97,7 +109,7 @@ if __name__ == "__main__":
                    rotation=[-np.pi/4, 0, 0],
                    light=DirectionalLight(diffuse = [1, 1, 1], specular = [0.25, 0.25, 0.25], ambient = [0.15, 0.15, 0.15]))
 
-    zorzal = mesh_from_file("assets/zorzal.obj")
+    zorzal = zorzal_asset.result()
     graph.add_node("zorzal")
     for i in range(len(zorzal)):
         graph.add_node(zorzal[i]["id"],
@@ -203,6 +215,19 @@ if __name__ == "__main__":
 
     #######################################
 
+    # Matrices reutilizadas en cada frame, así update() no crea arreglos nuevos.
+    # Cada nodo necesita su propia matriz, ya que por defecto comparten tr.identity()
+    for name in ["zorzal", "cube", "pyramid", "danger_sphere"]:
+        graph[name]["transform"] = tr.identity()
+    translation_buffer = tr.identity()
+    rotation_buffer = tr.identity()
+
+    def update_body_transform(name, body):
+        tr.matmul([
+            tr.translate(body.position[0], 0, body.position[1], out=translation_buffer),
+            tr.rotationY(-body.angle, out=rotation_buffer)
+        ], out=graph[name]["transform"])
+
     # Aquí se actualizan los parámetros de la simulación física
     def update_world(dt):
         world = controller.program_state["world"]
@@ -217,21 +242,21 @@ if __name__ == "__main__":
 
         # Actualización física del zorzal
         zorzal_body = controller.program_state["bodies"]["zorzal"]
-        graph["zorzal"]["transform"] = tr.translate(zorzal_body.position[0], 0, zorzal_body.position[1]) @ tr.rotationY(-zorzal_body.angle)
+        update_body_transform("zorzal", zorzal_body)
 
         # Actualización física de la caja
         box_body = controller.program_state["bodies"]["box"]
-        graph["cube"]["transform"] = tr.translate(box_body.position[0], 0, box_body.position[1]) @ tr.rotationY(-box_body.angle)
+        update_body_transform("cube", box_body)
 
         # Actualización física de la pirámide
         pyramid_body = controller.program_state["bodies"]["pyramid"]
-        graph["pyramid"]["transform"] = tr.translate(pyramid_body.position[0], 0, pyramid_body.position[1]) @ tr.rotationY(-pyramid_body.angle)
+        update_body_transform("pyramid", pyramid_body)
 
         # Actualización física de la caja peligrosa
         danger_body = controller.program_state["bodies"]["danger"]
         danger_body.position = (5 * np.cos(controller.program_state["total_time"] * 2), 5)
         danger_body.linearVelocity = (10, 10)
-        graph["danger_sphere"]["transform"] = tr.translate(danger_body.position[0], 0, danger_body.position[1]) @ tr.rotationY(-danger_body.angle)
+        update_body_transform("danger_sphere", danger_body)
 
         # Check condición de victoria, zorzal en winzone
         winzone_body = controller.program_state["bodies"]["winzone"]
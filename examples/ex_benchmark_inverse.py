@@ -0,0 +1,48 @@
+# coding=utf-8
+"""Benchmark: closed form affine inverses against np.linalg.inv"""
+
+import timeit
+import numpy as np
+
+import sys
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from grafica import transformations as tr
+
+N = 10000
+REPEATS = 20
+
+rng = np.random.default_rng(0)
+axis = np.array([1, 1, 1], dtype=np.float32) / np.sqrt(3)
+
+rigid = tr.batchMatmul([
+    tr.batchTranslate(*rng.uniform(-10, 10, (3, N))),
+    tr.batchRotationA(rng.uniform(0, 2 * np.pi, N), axis)
+])
+affine = tr.batchMatmul([rigid, tr.batchScale(*rng.uniform(0.5, 2, (3, N)))])
+
+
+def report(name, function):
+    seconds = min(timeit.repeat(function, number=1, repeat=REPEATS))
+    print(f"{name:<40} {1000 * seconds:8.3f} ms")
+    return seconds
+
+
+if __name__ == "__main__":
+
+    print(f"Single matrix, {N} calls")
+    report("np.linalg.inv", lambda: [np.linalg.inv(m) for m in affine])
+    report("tr.affineInverse", lambda: [tr.affineInverse(m) for m in affine])
+    report("tr.rigidInverse", lambda: [tr.rigidInverse(m) for m in rigid])
+    report("np.linalg.inv(...).T (normals)", lambda: [np.linalg.inv(m[:3, :3]).T for m in affine])
+    report("tr.normalMatrix", lambda: [tr.normalMatrix(m) for m in affine])
+
+    print(f"\nStack of {N} matrices, one call")
+    report("np.linalg.inv", lambda: np.linalg.inv(affine))
+    report("tr.affineInverse", lambda: tr.affineInverse(affine))
+    report("tr.rigidInverse", lambda: tr.rigidInverse(rigid))
+    report("np.linalg.inv(...).T (normals)", lambda: np.swapaxes(np.linalg.inv(affine[:, :3, :3]), -1, -2))
+    report("tr.normalMatrix", lambda: tr.normalMatrix(affine))
+
+    # Sanity check, both ways should agree
+    assert np.allclose(tr.affineInverse(affine), np.linalg.inv(affine), atol=1e-3)
@@ -0,0 +1,32 @@
+# coding=utf-8
+"""Benchmark: loading the OFF assets by parsing them (cold) or from their binary cache (warm)"""
+
+import glob
+import timeit
+
+import sys
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import grafica.basic_shapes as bs
+import grafica.mesh_cache as mc
+from grafica.assets_path import getAssetPath
+
+REPEATS = 5
+
+
+def report(filename):
+    cold = min(timeit.repeat(lambda: bs.readOFF(filename, (1, 1, 1), cache=False), number=1, repeat=REPEATS))
+
+    # First call writes the cache
+    bs.readOFF(filename, (1, 1, 1))
+    warm = min(timeit.repeat(lambda: bs.readOFF(filename, (1, 1, 1)), number=1, repeat=REPEATS))
+
+    cacheSize = os.path.getsize(mc.cachePath(filename, "off"))
+    print(f"{os.path.basename(filename):<16} {1000 * cold:9.2f} ms {1000 * warm:9.2f} ms {cold / warm:7.1f}x {cacheSize:>10} B")
+
+
+if __name__ == "__main__":
+
+    print(f"{'asset':<16} {'cold':>12} {'warm':>12} {'speedup':>8} {'cache size':>12}")
+    for filename in sorted(glob.glob(getAssetPath("*.off"))):
+        report(filename)
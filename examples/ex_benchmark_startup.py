@@ -0,0 +1,51 @@
+# coding=utf-8
+"""Benchmark: import time of the grafica modules, and whether they load OpenGL"""
+
+import subprocess
+import sys
+import os.path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEATS = 5
+
+MODULES = [
+    "grafica.transformations",
+    "grafica.quaternions",
+    "grafica.basic_shapes",
+    "grafica.gpu_shape",
+    "grafica.scene_graph",
+    "grafica.text_renderer",
+    "grafica.easy_shaders",
+    "grafica.lighting_shaders",
+]
+
+# Each import is timed on a fresh interpreter, otherwise modules would be already loaded
+PROGRAM = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "OpenGL.GL" in sys.modules)
+"""
+
+
+def importTime(module):
+    best = None
+    for _ in range(REPEATS):
+        output = subprocess.run(
+            [sys.executable, "-c", PROGRAM.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+        seconds, loadsOpenGL = float(output[0]), output[1] == "True"
+        best = seconds if best is None else min(best, seconds)
+    return best, loadsOpenGL
+
+
+if __name__ == "__main__":
+
+    print(f"{'module':<30} {'import':>10}   OpenGL loaded")
+    for module in MODULES:
+        seconds, loadsOpenGL = importTime(module)
+        print(f"{module:<30} {1000 * seconds:7.1f} ms   {loadsOpenGL}")
+
+    # Using GL loads the bindings on demand
+    seconds, _ = importTime("OpenGL.GL")
+    print(f"{'(first use of GL) OpenGL.GL':<30} {1000 * seconds:7.1f} ms")
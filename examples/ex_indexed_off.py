@@ -0,0 +1,27 @@
+# coding=utf-8
+"""Memory used by the OFF assets, with one vertex per triangle corner or indexed"""
+
+import glob
+
+import sys
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import grafica.basic_shapes as bs
+from grafica.assets_path import getAssetPath
+
+STRIDE = 9
+
+
+if __name__ == "__main__":
+
+    print(f"{'asset':<16} {'expanded':>12} {'indexed':>12} {'welded':>12}   saved")
+    for filename in sorted(glob.glob(getAssetPath("*.off"))):
+        expanded = bs.readOFF(filename, (1, 1, 1))
+        indexed = bs.readOFF(filename, (1, 1, 1), indexed=True)
+        welded = bs.weldVertices(expanded, STRIDE)
+
+        expandedSize = bs.memorySize(expanded)
+        indexedSize = bs.memorySize(indexed)
+        saved = 100 * (1 - indexedSize / expandedSize)
+        print(f"{os.path.basename(filename):<16} {expandedSize:>10} B {indexedSize:>10} B "
+              f"{bs.memorySize(welded):>10} B   {saved:.0f}%")
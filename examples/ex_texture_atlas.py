@@ -0,0 +1,23 @@
+# coding=utf-8
+"""Packing the roof and wall textures into a single atlas, with the region of each image"""
+
+import sys
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from grafica.texture_atlas import TextureAtlas
+from grafica.assets_path import getAssetPath
+
+NAMES = ["roof%d" % i for i in range(1, 6)] + ["wall%d" % i for i in range(1, 6)]
+
+
+if __name__ == "__main__":
+
+    atlas = TextureAtlas({name: getAssetPath(name + ".jpg") for name in NAMES}, maxImageSize=512)
+    print(f"atlas: {atlas.width}x{atlas.height} {atlas.image.mode}")
+
+    usedArea = 0
+    for name in NAMES:
+        u0, v0, u1, v1 = atlas.regions[name]
+        usedArea += (u1 - u0) * (v1 - v0)
+        print(f"{name:<8} u [{u0:.4f}, {u1:.4f}]  v [{v0:.4f}, {v1:.4f}]")
+    print(f"used: {100 * usedArea:.0f}%")
@@ -66,49 +66,29 @@ def setup_light(pipeline):
     GL.glUseProgram(pipeline.shaderProgram)
 
     # White light in all components: ambient, diffuse and specular.
-    GL.glUniform3f(GL.glGetUniformLocation(pipeline.shaderProgram, "La"), 1.0, 1.0, 1.0)
-    GL.glUniform3f(GL.glGetUniformLocation(pipeline.shaderProgram, "Ld"), 1.0, 1.0, 1.0)
-    GL.glUniform3f(GL.glGetUniformLocation(pipeline.shaderProgram, "Ls"), 1.0, 1.0, 1.0)
+    pipeline.setUniform3f("La", 1.0, 1.0, 1.0)
+    pipeline.setUniform3f("Ld", 1.0, 1.0, 1.0)
+    pipeline.setUniform3f("Ls", 1.0, 1.0, 1.0)
 
     # Object is barely visible at only ambient. Bright white for diffuse and specular components.
-    GL.glUniform3f(GL.glGetUniformLocation(pipeline.shaderProgram, "Ka"), 0.2, 0.2, 0.2)
-    GL.glUniform3f(GL.glGetUniformLocation(pipeline.shaderProgram, "Kd"), 0.9, 0.9, 0.9)
-    GL.glUniform3f(GL.glGetUniformLocation(pipeline.shaderProgram, "Ks"), 1.0, 1.0, 1.0)
+    pipeline.setUniform3f("Ka", 0.2, 0.2, 0.2)
+    pipeline.setUniform3f("Kd", 0.9, 0.9, 0.9)
+    pipeline.setUniform3f("Ks", 1.0, 1.0, 1.0)
 
     # TO DO: Explore different parameter combinations to understand their effect!
 
-    GL.glUniform3f(
-        GL.glGetUniformLocation(pipeline.shaderProgram, "lightPosition"), -2, 2, -1
-    )
-    GL.glUniform1ui(GL.glGetUniformLocation(pipeline.shaderProgram, "shininess"), 100)
+    pipeline.setUniform3f("lightPosition", -2, 2, -1)
+    pipeline.setUniform1ui("shininess", 100)
 
-    GL.glUniform1f(
-        GL.glGetUniformLocation(pipeline.shaderProgram, "constantAttenuation"), 0.0001
-    )
-    GL.glUniform1f(
-        GL.glGetUniformLocation(pipeline.shaderProgram, "linearAttenuation"), 0.03
-    )
-    GL.glUniform1f(
-        GL.glGetUniformLocation(pipeline.shaderProgram, "quadraticAttenuation"), 0.01
-    )
+    pipeline.setUniform1f("constantAttenuation", 0.0001)
+    pipeline.setUniform1f("linearAttenuation", 0.03)
+    pipeline.setUniform1f("quadraticAttenuation", 0.01)
 
 def setup_matrices(pipeline, model, view, projection):
     GL.glUseProgram(pipeline.shaderProgram)
-    GL.glUniformMatrix4fv(
-        GL.glGetUniformLocation(gouraud.shaderProgram, "model"),
-        1,
-        GL.GL_TRUE,
-        model,
-    )
-    GL.glUniformMatrix4fv(
-        GL.glGetUniformLocation(gouraud.shaderProgram, "projection"),
-        1,
-        GL.GL_TRUE,
-        projection,
-    )
-    GL.glUniformMatrix4fv(
-        GL.glGetUniformLocation(gouraud.shaderProgram, "view"), 1, GL.GL_TRUE, view
-    )
+    pipeline.setUniformMatrix4("model", model)
+    pipeline.setUniformMatrix4("projection", projection)
+    pipeline.setUniformMatrix4("view", view)
 
 def create_quad():
     vertices = np.array(
@@ -237,9 +217,8 @@ if __name__ == "__main__":
 
         GL.glUseProgram(gouraud.shaderProgram)
 
-        GL.glUniform3fv(
-            GL.glGetUniformLocation(gouraud.shaderProgram, "viewPosition"), 1, viewPos
-        )
+        # Only uploaded when the camera moved
+        gouraud.setUniform3fv("viewPosition", viewPos)
 
         for gpu_shape in zorzal_gpu_shape.values():
             gouraud.drawCall(gpu_shape)
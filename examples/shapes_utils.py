@@ -6,6 +6,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import grafica.transformations as tr
 import grafica.basic_shapes as bs
 from grafica.gpu_shape import createGPUShape
+from grafica.shader_program import getUniformLocation
 
 
 class HighLevelGPUShape:
@@ -62,7 +63,7 @@ class HighLevelGPUShape:
     def draw(self, pipeline, transform_shader_param="transform"):
         # TODO: assert that pipeline has transform uniform
         glUniformMatrix4fv(
-            glGetUniformLocation(pipeline.shaderProgram, transform_shader_param),
+            getUniformLocation(pipeline, transform_shader_param),
             1,
             GL_TRUE,
             self._transform,
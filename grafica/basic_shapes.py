@@ -8,11 +8,13 @@ import sys
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from grafica.assets_path import getAssetPath
+import grafica.mesh_cache as mc
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
-# A simple class container to store vertices and indices that define a shape
+# A simple class container to store vertices and indices that define a shape.
+# They are flat python lists, or flat numpy arrays after calling toArrays.
 class Shape:
     def __init__(self, vertices, indices):
         self.vertices = vertices
@@ -25,17 +27,84 @@ class Shape:
     
 
 
+def toArrays(shape):
+    """Returns a shape with the same data as numpy arrays: float32 vertices and
+    uint32 indices, both flat. The operations below run vectorized on them."""
+    return Shape(
+        np.asarray(shape.vertices, dtype=np.float32).reshape(-1),
+        np.asarray(shape.indices, dtype=np.uint32).reshape(-1))
+
+
+def _vertexRows(vertices, stride):
+    """(numberOfVertices, stride) view of flat vertex data"""
+    numberOfVertices = len(vertices) // stride
+    return vertices[:numberOfVertices * stride].reshape(numberOfVertices, stride)
+
+
+def memorySize(shape):
+    """Bytes used by the shape once uploaded as float32 vertices and uint32 indices"""
+    return 4 * (len(shape.vertices) + len(shape.indices))
+
+
+def weldVertices(shape, stride):
+    """Returns an array based shape where identical vertices, equal in all of
+    their attributes, are stored once and shared through the indices.
+    Vertices keep the order of their first appearance."""
+    shape = toArrays(shape)
+
+    # Adding zero turns -0.0 into 0.0, both must be the same key
+    rows = np.ascontiguousarray(_vertexRows(shape.vertices, stride) + np.float32(0))
+    keys = rows.view(np.dtype((np.void, rows.itemsize * stride))).reshape(-1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    order = np.argsort(first)
+    newIndex = np.empty_like(order)
+    newIndex[order] = np.arange(len(order))
+
+    return Shape(
+        rows[first[order]].reshape(-1),
+        newIndex[inverse.reshape(-1)][shape.indices].astype(np.uint32))
+
+
 def merge(destinationShape, strideSize, sourceShape):
 
     # current vertices are an offset for indices refering to vertices of the new shape
-    offset = len(destinationShape.vertices)
-    destinationShape.vertices += sourceShape.vertices
-    destinationShape.indices += [(offset/strideSize) + index for index in sourceShape.indices]
+    offset = len(destinationShape.vertices) // strideSize
+
+    if isinstance(destinationShape.vertices, np.ndarray):
+        destinationShape.vertices = np.concatenate([
+            destinationShape.vertices,
+            np.asarray(sourceShape.vertices, dtype=destinationShape.vertices.dtype)])
+        destinationShape.indices = np.concatenate([
+            destinationShape.indices,
+            np.asarray(sourceShape.indices, dtype=np.uint32) + np.uint32(offset)])
+    else:
+        destinationShape.vertices += sourceShape.vertices
+        destinationShape.indices += [offset + index for index in sourceShape.indices]
+
+
+def concatenate(shapes, strideSize):
+    """Merges all shapes into a new array based shape, in a single pass.
+    Prefer it over calling merge in a loop, which copies the data every time."""
+    shapes = [toArrays(shape) for shape in shapes]
+    if not shapes:
+        return toArrays(Shape([], []))
+
+    vertexCounts = [len(shape.vertices) // strideSize for shape in shapes]
+    offsets = np.cumsum([0] + vertexCounts[:-1]).astype(np.uint32)
+
+    return Shape(
+        np.concatenate([shape.vertices for shape in shapes]),
+        np.concatenate([shape.indices + offset for shape, offset in zip(shapes, offsets)]))
 
 
 def applyOffset(shape, stride, offset):
 
-    numberOfVertices = len(shape.vertices)//stride
+    if isinstance(shape.vertices, np.ndarray):
+        _vertexRows(shape.vertices, stride)[:, :3] += offset
+        return
+
+    numberOfVertices = len(shape.vertices) // stride
 
     for i in range(numberOfVertices):
         index = i * stride
@@ -46,6 +115,10 @@ def applyOffset(shape, stride, offset):
 
 def scaleVertices(shape, stride, scaleFactor):
 
+    if isinstance(shape.vertices, np.ndarray):
+        _vertexRows(shape.vertices, stride)[:, :3] *= scaleFactor
+        return
+
     numberOfVertices = len(shape.vertices) // stride
 
     for i in range(numberOfVertices):
@@ -270,82 +343,120 @@ def createRainbowCube():
 
     return Shape(vertices, indices)
 
-def readOFF(filename, color):
-    vertices = []
-    normals= []
-    faces = []
+def _readOFFData(filename):
+    """Parses an OFF file with bulk numpy conversions.
+    Returns vertex positions (numVertices, 3), the number of vertices of each
+    face, and the vertex indices of all faces one after the other."""
 
     with open(filename, 'r') as file:
-        line = file.readline().strip()
-        assert line=="OFF"
-
-        line = file.readline().strip()
-        aux = line.split(' ')
-
-        numVertices = int(aux[0])
-        numFaces = int(aux[1])
-
-        for i in range(numVertices):
-            aux = file.readline().strip().split(' ')
-            vertices += [float(coord) for coord in aux[0:]]
-        
-        vertices = np.asarray(vertices)
-        vertices = np.reshape(vertices, (numVertices, 3))
-        #print(f'Vertices shape: {vertices.shape}')
-
-        normals = np.zeros((numVertices,3), dtype=np.float32)
-        #print(f'Normals shape: {normals.shape}')
-
-        for i in range(numFaces):
-            aux = file.readline().strip().split(' ')
-            aux = [int(index) for index in aux[0:]]
-            faces += [aux[1:]]
-            
-            vecA = [vertices[aux[2]][0] - vertices[aux[1]][0], vertices[aux[2]][1] - vertices[aux[1]][1], vertices[aux[2]][2] - vertices[aux[1]][2]]
-            vecB = [vertices[aux[3]][0] - vertices[aux[2]][0], vertices[aux[3]][1] - vertices[aux[2]][1], vertices[aux[3]][2] - vertices[aux[2]][2]]
-
-            res = np.cross(vecA, vecB)
-            normals[aux[1]][0] += res[0]  
-            normals[aux[1]][1] += res[1]  
-            normals[aux[1]][2] += res[2]  
-
-            normals[aux[2]][0] += res[0]  
-            normals[aux[2]][1] += res[1]  
-            normals[aux[2]][2] += res[2]  
-
-            normals[aux[3]][0] += res[0]  
-            normals[aux[3]][1] += res[1]  
-            normals[aux[3]][2] += res[2]  
-        #print(faces)
-        norms = np.linalg.norm(normals,axis=1)
-        normals = normals/norms[:,None]
-
-        color = np.asarray(color)
-        color = np.tile(color, (numVertices, 1))
-
-        vertexData = np.concatenate((vertices, color), axis=1)
-        vertexData = np.concatenate((vertexData, normals), axis=1)
-
-        #print(vertexData.shape)
-
-        indices = []
-        vertexDataF = []
-        index = 0
-
-        for face in faces:
-            vertex = vertexData[face[0],:]
-            vertexDataF += vertex.tolist()
-            vertex = vertexData[face[1],:]
-            vertexDataF += vertex.tolist()
-            vertex = vertexData[face[2],:]
-            vertexDataF += vertex.tolist()
-            
-            indices += [index, index + 1, index + 2]
-            index += 3        
-
-
-
-        return Shape(vertexDataF, indices)
+        # Comments and blank lines are not part of the data
+        lines = [line.split('#', 1)[0].strip() for line in file]
+    lines = [line for line in lines if line]
+
+    assert lines[0].startswith("OFF")
+
+    # Counts may share the line with the OFF keyword
+    header = lines[0][3:].split()
+    if header:
+        body = lines[1:]
+    else:
+        header = lines[1].split()
+        body = lines[2:]
+
+    numVertices = int(header[0])
+    numFaces = int(header[1])
+
+    vertexLines = body[:numVertices]
+    faceLines = body[numVertices:numVertices + numFaces]
+
+    vertexTokens = np.array(" ".join(vertexLines).split(), dtype=np.float64)
+    if vertexTokens.size == 3 * numVertices:
+        positions = vertexTokens.reshape(numVertices, 3)
+    else:
+        # Vertices with extra data, e.g. colors
+        positions = np.array([line.split()[:3] for line in vertexLines], dtype=np.float64)
+
+    # Usual case, all faces with the same number of vertices and without colors
+    faceTokens = np.array(" ".join(faceLines).split(), dtype=np.float64)
+    faceSize = int(faceTokens[0]) if faceTokens.size > 0 else 0
+    if faceTokens.size == numFaces * (faceSize + 1):
+        faceTokens = faceTokens.reshape(numFaces, faceSize + 1)
+        if np.all(faceTokens[:, 0] == faceSize):
+            counts = np.full(numFaces, faceSize, dtype=np.int64)
+            return positions, counts, faceTokens[:, 1:].astype(np.uint32).reshape(-1)
+
+    faces = [line.split() for line in faceLines]
+    counts = np.array([int(face[0]) for face in faces], dtype=np.int64)
+    indices = np.array([index for face, count in zip(faces, counts) for index in face[1:count + 1]], dtype=np.uint32)
+    return positions, counts, indices
+
+
+def _fanTriangulate(counts, indices):
+    """Splits faces with counts[i] vertices into counts[i] - 2 triangles
+    sharing the first vertex. Returns (numTriangles, 3) vertex indices."""
+    trianglesPerFace = np.maximum(counts - 2, 0)
+    faceStart = np.cumsum(counts) - counts
+
+    face = np.repeat(np.arange(len(counts)), trianglesPerFace)
+    corner = np.arange(len(face)) - np.repeat(np.cumsum(trianglesPerFace) - trianglesPerFace, trianglesPerFace)
+    first = faceStart[face]
+
+    return np.stack([
+        indices[first],
+        indices[first + corner + 1],
+        indices[first + corner + 2]], axis=1)
+
+
+def _vertexNormals(positions, triangles):
+    """Smooth normals, each vertex gets the area weighted sum of the normals of its faces"""
+    # In double precision, opposite faces may almost cancel out
+    a, b, c = positions[triangles[:, 0]], positions[triangles[:, 1]], positions[triangles[:, 2]]
+    faceNormals = np.cross(b - a, c - b)
+
+    normals = np.zeros_like(positions)
+    for corner in range(3):
+        np.add.at(normals, triangles[:, corner], faceNormals)
+
+    norms = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, norms, out=normals, where=norms > 0)
+
+
+def _readOFFGeometry(filename):
+    """Positions, smooth normals and triangles of an OFF file, as stored in its cache"""
+    positions, counts, indices = _readOFFData(filename)
+    triangles = _fanTriangulate(counts, indices)
+    normals = _vertexNormals(positions, triangles)
+    return {
+        "positions": positions.astype(np.float32),
+        "normals": normals.astype(np.float32),
+        "triangles": triangles.astype(np.uint32)}
+
+
+def readOFF(filename, color, indexed=False, cache=True):
+    """Shape with vertices [x, y, z, r, g, b, nx, ny, nz] from an OFF file.
+    Faces with more than 3 vertices are triangulated as fans, normals are smooth.
+    Vertices and indices are float32 and uint32 numpy arrays.
+    By default every triangle has its own three vertices, with indexed=True
+    the vertices of the file are shared between faces, as normals are smooth
+    this gives the same surface with about a sixth of the vertices.
+    With cache=True the parsed geometry is stored next to the file (see
+    grafica.mesh_cache), later calls read it from there."""
+
+    if cache:
+        geometry = mc.cached(filename, "off", lambda: _readOFFGeometry(filename))
+    else:
+        geometry = _readOFFGeometry(filename)
+    positions, normals, triangles = geometry["positions"], geometry["normals"], geometry["triangles"]
+
+    colors = np.broadcast_to(np.asarray(color, dtype=np.float32), positions.shape)
+    vertexData = np.concatenate((positions, colors, normals), axis=1)
+
+    if indexed:
+        return Shape(vertexData.reshape(-1), triangles.reshape(-1))
+
+    # Every triangle gets its own three vertices
+    vertexData = vertexData[triangles.reshape(-1)]
+    return Shape(vertexData.reshape(-1), np.arange(len(vertexData), dtype=np.uint32))
 
 def createColorCubeTarea2(r,g,b):
 
@@ -0,0 +1,273 @@
+# coding=utf-8
+"""Block compressed textures (S3TC: BC1/DXT1 and BC3/DXT5) in DDS files.
+
+Textures are converted offline, once:
+
+    python -m grafica.compressed_textures assets/*.jpg
+
+writing "assets/bricks.dds" next to "assets/bricks.jpg", with all its mipmap
+levels. BC1 stores 4 bits per texel (opaque images) and BC3 8 bits per texel
+(images with alpha), against 24 or 32 bits of raw RGB/RGBA, and the GPU keeps
+them compressed. The files store rows bottom to top, as OpenGL expects them, so
+they are uploaded without flipping or decoding:
+
+    texture, width, height = compressed_texture_2D_setup("assets/bricks.dds")
+
+When the driver lacks S3TC support the file is decoded and uploaded as raw RGBA.
+"""
+
+import argparse
+import os
+import struct
+import numpy as np
+from PIL import Image
+
+from grafica.lazy_gl import GL
+from grafica.mipmaps import box_filter_mipmaps
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+# From EXT_texture_compression_s3tc, not taken from PyOpenGL so converting
+# files does not load it
+GL_COMPRESSED_RGB_S3TC_DXT1_EXT = 0x83F0
+GL_COMPRESSED_RGBA_S3TC_DXT5_EXT = 0x83F3
+
+# fourCC: (bytes per 4x4 block, OpenGL internal format)
+FORMATS = {
+    b"DXT1": (8, GL_COMPRESSED_RGB_S3TC_DXT1_EXT),
+    b"DXT5": (16, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT),
+}
+
+# magic, size, flags, height, width, linear size, depth, mipmap count, reserved,
+# pixel format (size, flags, fourCC, bit count, masks), caps, caps2-4, reserved
+_DDS_HEADER = struct.Struct("<4s7I44s2I4s5I5I")
+_DDSD_FLAGS = 0x1 | 0x2 | 0x4 | 0x1000 | 0x80000  # caps, height, width, pixel format, linear size
+_DDSD_MIPMAPCOUNT = 0x20000
+_DDPF_FOURCC = 0x4
+_DDSCAPS_TEXTURE = 0x1000
+_DDSCAPS_MIPMAP = 0x8 | 0x400000  # complex, mipmap
+
+_s3tcSupported = None
+
+
+def s3tc_supported():
+    """True if the current context supports S3TC textures"""
+    global _s3tcSupported
+    if _s3tcSupported is None:
+        extensions = {GL.glGetStringi(GL.GL_EXTENSIONS, i) for i in range(GL.glGetIntegerv(GL.GL_NUM_EXTENSIONS))}
+        _s3tcSupported = b"GL_EXT_texture_compression_s3tc" in extensions
+    return _s3tcSupported
+
+
+def _blocks(data):
+    """(blocks, 16, channels) texels of a (height, width, channels) image, in 4x4
+    blocks row by row. Sides are padded to multiples of 4 repeating the border."""
+    height, width, channels = data.shape
+    data = np.pad(data, ((0, -height % 4), (0, -width % 4), (0, 0)), mode="edge")
+    rows, columns = data.shape[0] // 4, data.shape[1] // 4
+    return data.reshape(rows, 4, columns, 4, channels).transpose(0, 2, 1, 3, 4).reshape(-1, 16, channels)
+
+
+def _nearest(values, palette):
+    """Index of the palette entry closest to each value. values: (blocks, 16, c), palette: (blocks, n, c)"""
+    distances = ((values[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=3)
+    return distances.argmin(axis=2).astype(np.uint64)
+
+
+def _packIndices(indices, bits):
+    """Packs (blocks, 16) indices of the given bits, the first texel in the lowest bits"""
+    shifts = np.arange(16, dtype=np.uint64) * np.uint64(bits)
+    return np.bitwise_or.reduce(indices << shifts, axis=1)
+
+
+def _to565(colors):
+    colors = colors.astype(np.uint16)
+    return (colors[..., 0] >> 3) << 11 | (colors[..., 1] >> 2) << 5 | colors[..., 2] >> 3
+
+
+def _from565(values):
+    r = (values >> 11) & 31
+    g = (values >> 5) & 63
+    b = values & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1).astype(np.float32)
+
+
+def _colorBlocks(texels):
+    """8 bytes color blocks for (blocks, 16, 3) texels, always in 4 colors mode"""
+    texels = texels.astype(np.float32)
+
+    # Endpoints at the corners of the bounding box, inset to reduce the error of the extremes
+    low = texels.min(axis=1)
+    high = texels.max(axis=1)
+    inset = (high - low) / 16
+    color0 = _to565(np.clip(high - inset, 0, 255))
+    color1 = _to565(np.clip(low + inset, 0, 255))
+
+    # color0 <= color1 would select the 3 colors mode
+    swap = color0 < color1
+    color0, color1 = np.where(swap, color1, color0), np.where(swap, color0, color1)
+    equal = color0 == color1
+
+    end0 = _from565(color0)
+    end1 = _from565(color1)
+    palette = np.stack([end0, end1, (2 * end0 + end1) / 3, (end0 + 2 * end1) / 3], axis=1)
+    indices = _packIndices(_nearest(texels, palette), 2)
+    indices[equal] = 0
+
+    blocks = np.zeros((len(texels), 8), dtype=np.uint8)
+    blocks[:, 0:2] = color0.astype("<u2").view(np.uint8).reshape(-1, 2)
+    blocks[:, 2:4] = color1.astype("<u2").view(np.uint8).reshape(-1, 2)
+    blocks[:, 4:8] = indices.astype("<u4").view(np.uint8).reshape(-1, 4)
+    return blocks
+
+
+def _alphaBlocks(alpha):
+    """8 bytes alpha blocks for (blocks, 16, 1) alpha values, in 8 values mode"""
+    alpha = alpha.astype(np.float32)
+    alpha0 = alpha.max(axis=1)[:, 0]
+    alpha1 = alpha.min(axis=1)[:, 0]
+
+    steps = np.arange(1, 7, dtype=np.float32)
+    interpolated = ((7 - steps) * alpha0[:, None] + steps * alpha1[:, None]) / 7
+    palette = np.concatenate([alpha0[:, None], alpha1[:, None], interpolated], axis=1)[:, :, None]
+    indices = _packIndices(_nearest(alpha, palette), 3)
+    indices[alpha0 == alpha1] = 0
+
+    blocks = np.zeros((len(alpha), 8), dtype=np.uint8)
+    blocks[:, 0] = alpha0
+    blocks[:, 1] = alpha1
+    blocks[:, 2:8] = indices.astype("<u8").view(np.uint8).reshape(-1, 8)[:, :6]
+    return blocks
+
+
+def compress_bc1(data):
+    """BC1 (DXT1) blocks of a (height, width, 3) uint8 image"""
+    return _colorBlocks(_blocks(data[:, :, :3])).tobytes()
+
+
+def compress_bc3(data):
+    """BC3 (DXT5) blocks of a (height, width, 4) uint8 image"""
+    texels = _blocks(data)
+    return np.concatenate([_alphaBlocks(texels[:, :, 3:]), _colorBlocks(texels[:, :, :3])], axis=1).tobytes()
+
+
+def write_dds(path, width, height, fourCC, levels):
+    """Writes the compressed mipmap levels (bytes, the first one is the full size)"""
+    flags = _DDSD_FLAGS | (_DDSD_MIPMAPCOUNT if len(levels) > 1 else 0)
+    caps = _DDSCAPS_TEXTURE | (_DDSCAPS_MIPMAP if len(levels) > 1 else 0)
+    header = _DDS_HEADER.pack(
+        b"DDS ", 124, flags, height, width, len(levels[0]), 0, len(levels), b"",
+        32, _DDPF_FOURCC, fourCC, 0, 0, 0, 0, 0,
+        caps, 0, 0, 0, 0)
+    with open(path, "wb") as f:
+        f.write(header)
+        for level in levels:
+            f.write(level)
+
+
+def read_dds(path):
+    """width, height, fourCC and list of compressed mipmap levels of a DXT1 or DXT5 DDS file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    fields = _DDS_HEADER.unpack_from(data)
+    magic, _, flags, height, width, _, _, mipmapCount = fields[:8]
+    fourCC = fields[11]
+    if magic != b"DDS " or fourCC not in FORMATS:
+        raise ValueError("%s is not a DXT1 or DXT5 DDS file" % path)
+
+    blockSize = FORMATS[fourCC][0]
+    levels = []
+    offset = _DDS_HEADER.size
+    levelWidth, levelHeight = width, height
+    for _ in range(max(1, mipmapCount if flags & _DDSD_MIPMAPCOUNT else 1)):
+        size = max(1, (levelWidth + 3) // 4) * max(1, (levelHeight + 3) // 4) * blockSize
+        levels.append(data[offset:offset + size])
+        offset += size
+        levelWidth, levelHeight = max(1, levelWidth // 2), max(1, levelHeight // 2)
+    return width, height, fourCC, levels
+
+
+def convert(sourcePath, destinationPath=None, mipmaps=True, flip_top_bottom=True):
+    """Compresses an image file into a DDS file, BC3 if it has transparent texels
+    and BC1 otherwise. Returns the path of the DDS file."""
+    if destinationPath is None:
+        destinationPath = os.path.splitext(sourcePath)[0] + ".dds"
+
+    image = Image.open(sourcePath).convert("RGBA")
+    if flip_top_bottom:
+        image = image.transpose(Image.FLIP_TOP_BOTTOM)
+    data = np.asarray(image, dtype=np.uint8)
+
+    opaque = bool(np.all(data[:, :, 3] == 255))
+    compress = compress_bc1 if opaque else compress_bc3
+    levels = box_filter_mipmaps(data) if mipmaps else [data]
+
+    write_dds(destinationPath, image.size[0], image.size[1], b"DXT1" if opaque else b"DXT5",
+              [compress(level) for level in levels])
+    return destinationPath
+
+
+def compressed_texture_2D_setup(
+    path,
+    sWrapMode=None,
+    tWrapMode=None,
+    minFilterMode=None,
+    maxFilterMode=None,
+    anisotropy=1.0
+):
+    # Same parameters as texture_2D_setup, None meaning its defaults
+    # (GL_CLAMP_TO_EDGE, GL_LINEAR). Mipmaps are the ones stored in the file.
+    # Returns the texture, its width and its height.
+    from grafica.textures import texture_2D_setup, set_anisotropy, MIPMAP_FILTERS
+
+    sWrapMode = GL.GL_CLAMP_TO_EDGE if sWrapMode is None else sWrapMode
+    tWrapMode = GL.GL_CLAMP_TO_EDGE if tWrapMode is None else tWrapMode
+    minFilterMode = GL.GL_LINEAR if minFilterMode is None else minFilterMode
+    maxFilterMode = GL.GL_LINEAR if maxFilterMode is None else maxFilterMode
+
+    width, height, fourCC, levels = read_dds(path)
+
+    if not s3tc_supported():
+        # Pillow decodes DXT1/DXT5, the file is already flipped
+        image = Image.open(path)
+        return texture_2D_setup(image.convert(image.mode if image.mode in ("RGB", "RGBA") else "RGBA"),
+                                sWrapMode, tWrapMode, minFilterMode, maxFilterMode, flip_top_bottom=False,
+                                anisotropy=anisotropy), width, height
+
+    texture = GL.glGenTextures(1)
+    GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, sWrapMode)
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, tWrapMode)
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, minFilterMode)
+    GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, maxFilterMode)
+    if anisotropy > 1:
+        set_anisotropy(anisotropy)
+
+    # Without all the levels down to 1x1 the texture would be incomplete
+    if minFilterMode in MIPMAP_FILTERS:
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAX_LEVEL, len(levels) - 1)
+    else:
+        levels = levels[:1]
+
+    internalFormat = FORMATS[fourCC][1]
+    levelWidth, levelHeight = width, height
+    for level, data in enumerate(levels):
+        GL.glCompressedTexImage2D(GL.GL_TEXTURE_2D, level, internalFormat, levelWidth, levelHeight, 0, np.frombuffer(data, np.uint8))
+        levelWidth, levelHeight = max(1, levelWidth // 2), max(1, levelHeight // 2)
+
+    return texture, width, height
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compress images into DXT1/DXT5 DDS textures")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--no-mipmaps", action="store_true")
+    parser.add_argument("--no-flip", action="store_true", help="keep rows top to bottom")
+    args = parser.parse_args()
+
+    for imagePath in args.images:
+        ddsPath = convert(imagePath, mipmaps=not args.no_mipmaps, flip_top_bottom=not args.no_flip)
+        print(f"{imagePath} -> {ddsPath}: {os.path.getsize(imagePath)} B -> {os.path.getsize(ddsPath)} B")
@@ -8,6 +8,7 @@ from PIL import Image
 
 import grafica.basic_shapes as bs
 from grafica.gpu_shape import GPUShape
+from grafica.shader_program import ShaderProgram
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -49,7 +50,7 @@ def textureSimpleSetup(imgName, sWrapMode, tWrapMode, minFilterMode, maxFilterMo
     return texture
 
 
-class SimpleShaderProgram:
+class SimpleShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -82,9 +83,7 @@ class SimpleShaderProgram:
         VAO = glGenVertexArrays(1)
         glBindVertexArray(VAO)
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -95,11 +94,11 @@ class SimpleShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
@@ -118,7 +117,7 @@ class SimpleShaderProgram:
         glBindVertexArray(0)
 
 
-class SimpleTextureShaderProgram:
+class SimpleTextureShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -157,9 +156,7 @@ class SimpleTextureShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
     def setupVAO(self, gpuShape):
         glBindVertexArray(gpuShape.vao)
@@ -168,11 +165,11 @@ class SimpleTextureShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
+        texCoords = self.getAttribLocation("texCoords")
         glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
         glEnableVertexAttribArray(texCoords)
 
@@ -192,7 +189,7 @@ class SimpleTextureShaderProgram:
         glBindVertexArray(0)
 
 
-class SimpleTransformShaderProgram:
+class SimpleTransformShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -230,9 +227,7 @@ class SimpleTransformShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
     def setupVAO(self, gpuShape):
         glBindVertexArray(gpuShape.vao)
@@ -241,11 +236,11 @@ class SimpleTransformShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
@@ -264,7 +259,7 @@ class SimpleTransformShaderProgram:
         glBindVertexArray(0)
 
 
-class SimpleTextureTransformShaderProgram:
+class SimpleTextureTransformShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -306,9 +301,7 @@ class SimpleTextureTransformShaderProgram:
 
 
         # Compiling our shader program
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -319,11 +312,11 @@ class SimpleTextureTransformShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
+        texCoords = self.getAttribLocation("texCoords")
         glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(3 * SIZE_IN_BYTES))
         glEnableVertexAttribArray(texCoords)
 
@@ -342,7 +335,7 @@ class SimpleTextureTransformShaderProgram:
         glBindVertexArray(0)
 
 
-class SimpleModelViewProjectionShaderProgram:
+class SimpleModelViewProjectionShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -380,9 +373,7 @@ class SimpleModelViewProjectionShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -393,11 +384,11 @@ class SimpleModelViewProjectionShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
@@ -416,7 +407,82 @@ class SimpleModelViewProjectionShaderProgram:
         glBindVertexArray(0)
 
 
-class SimpleTextureModelViewProjectionShaderProgram:
+class InstancedModelViewProjectionShaderProgram(ShaderProgram):
+    """SimpleModelViewProjectionShaderProgram drawing many copies of a shape in
+    a single call, each one with its model transform and color from an InstanceBuffer"""
+
+    def __init__(self):
+
+        vertex_shader = """
+            #version 330
+            
+            uniform mat4 projection;
+            uniform mat4 view;
+
+            in vec3 position;
+            in vec3 color;
+            in mat4 instanceModel;
+            in vec3 instanceColor;
+
+            out vec3 newColor;
+            void main()
+            {
+                gl_Position = projection * view * instanceModel * vec4(position, 1.0f);
+                newColor = color * instanceColor;
+            }
+            """
+
+        fragment_shader = """
+            #version 330
+            in vec3 newColor;
+
+            out vec4 outColor;
+            void main()
+            {
+                outColor = vec4(newColor, 1.0f);
+            }
+            """
+
+        # Binding artificial vertex array object for validation
+        VAO = glGenVertexArrays(1)
+        glBindVertexArray(VAO)
+
+
+        self.compile(vertex_shader, fragment_shader)
+
+
+    def setupVAO(self, gpuShape):
+
+        glBindVertexArray(gpuShape.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+
+        # 3d vertices + rgb color specification => 3*4 + 3*4 = 24 bytes
+        position = self.getAttribLocation("position")
+        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(position)
+        
+        color = self.getAttribLocation("color")
+        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
+        glEnableVertexAttribArray(color)
+
+        # Unbinding current vao
+        glBindVertexArray(0)
+
+
+    def drawInstanced(self, gpuShape, instanceBuffer, mode=GL_TRIANGLES):
+        assert isinstance(gpuShape, GPUShape)
+
+        # Binding the VAO with the instance attributes, created once per shape, and executing the draw call
+        glBindVertexArray(instanceBuffer.attach(self, gpuShape))
+        glDrawElementsInstanced(mode, gpuShape.size, GL_UNSIGNED_INT, None, instanceBuffer.count)
+
+        # Unbind the current VAO
+        glBindVertexArray(0)
+
+
+class SimpleTextureModelViewProjectionShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -459,9 +525,7 @@ class SimpleTextureModelViewProjectionShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -472,11 +536,11 @@ class SimpleTextureModelViewProjectionShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
+        texCoords = self.getAttribLocation("texCoords")
         glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(12))
         glEnableVertexAttribArray(texCoords)
 
@@ -1,8 +1,8 @@
 # coding=utf-8
 """A convenience class container to reference a shape on GPU memory"""
 
-#import OpenGL.GL as ogl
-from OpenGL.GL import *
+import ctypes
+from grafica.lazy_gl import GL
 import numpy as np
 
 __author__ = "Daniel Calderon"
@@ -21,6 +21,9 @@ class GPUShape:
         self.ebo = None
         self.texture = None
         self.size = None
+        self.usage = None
+        self.vertexBytes = 0
+        self.indexBytes = 0
 
     def initBuffers(self):
         """Convenience function for initialization of OpenGL buffers.
@@ -30,9 +33,9 @@ class GPUShape:
         Note: this is not the default constructor as you may want
         to use some already existing buffers.
         """
-        self.vao = glGenVertexArrays(1)
-        self.vbo = glGenBuffers(1)
-        self.ebo = glGenBuffers(1)
+        self.vao = GL.glGenVertexArrays(1)
+        self.vbo = GL.glGenBuffers(1)
+        self.ebo = GL.glGenBuffers(1)
         return self
 
     def __str__(self):
@@ -42,32 +45,156 @@ class GPUShape:
             "  tex=" + str(self.texture)
 
     def fillBuffers(self, vertices, indices, usage):
-
-        vertexData = np.array(vertices, dtype=np.float32)
-        indices = np.array(indices, dtype=np.uint32)
-
-        self.size = len(indices)
-
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, len(vertexData) * SIZE_IN_BYTES, vertexData, usage)
-
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, len(indices) * SIZE_IN_BYTES, indices, usage)
+        """Float32 vertices and uint32 indices that are already contiguous arrays
+        (e.g. from basic_shapes.toArrays) are uploaded without copying them.
+        Use GL_DYNAMIC_DRAW or GL_STREAM_DRAW as usage to update them later."""
+
+        vertexData = np.ascontiguousarray(vertices, dtype=np.float32)
+        indices = np.ascontiguousarray(indices, dtype=np.uint32)
+
+        self.size = indices.size
+        self.usage = usage
+        self.vertexBytes = vertexData.nbytes
+        self.indexBytes = indices.nbytes
+
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, vertexData.nbytes, vertexData, usage)
+
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, usage)
+
+    def updateBuffers(self, offset, data):
+        """Overwrites part of the vertex buffer with glBufferSubData, offset and
+        data measured in floats. The buffer keeps its size and the indices."""
+
+        vertexData = np.ascontiguousarray(data, dtype=np.float32)
+        start = offset * SIZE_IN_BYTES
+        if offset < 0 or start + vertexData.nbytes > self.vertexBytes:
+            raise ValueError("Update of %d floats at %d out of a buffer of %d floats"
+                % (vertexData.size, offset, self.vertexBytes // SIZE_IN_BYTES))
+
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        GL.glBufferSubData(GL.GL_ARRAY_BUFFER, start, vertexData.nbytes, vertexData)
+
+    def streamBuffers(self, vertices, indices=None):
+        """Replaces all the vertices, and the indices if given, e.g. once per frame.
+        With the same size the old storage is orphaned first, so the driver
+        does not wait for the draw calls still reading it.
+        On a shape not filled with fillBuffers, usage is GL_STREAM_DRAW."""
+
+        if self.usage is None:
+            self.usage = GL.GL_STREAM_DRAW
+
+        vertexData = np.ascontiguousarray(vertices, dtype=np.float32)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        if vertexData.nbytes == self.vertexBytes:
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, vertexData.nbytes, None, self.usage)
+            GL.glBufferSubData(GL.GL_ARRAY_BUFFER, 0, vertexData.nbytes, vertexData)
+        else:
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, vertexData.nbytes, vertexData, self.usage)
+            self.vertexBytes = vertexData.nbytes
+
+        if indices is not None:
+            indices = np.ascontiguousarray(indices, dtype=np.uint32)
+            GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+            GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, self.usage)
+            self.size = indices.size
+            self.indexBytes = indices.nbytes
 
     def clear(self):
         """Freeing GPU memory"""
 
         if self.texture != None:
-            glDeleteTextures(1, [self.texture])
+            GL.glDeleteTextures(1, [self.texture])
         
         if self.ebo != None:
-            glDeleteBuffers(1, [self.ebo])
+            GL.glDeleteBuffers(1, [self.ebo])
 
         if self.vbo != None:
-            glDeleteBuffers(1, [self.vbo])
+            GL.glDeleteBuffers(1, [self.vbo])
 
         if self.vao != None:
-            glDeleteVertexArrays(1, [self.vao])
+            GL.glDeleteVertexArrays(1, [self.vao])
+
+
+class InstanceBuffer:
+    """Per instance model transform and color, for the drawInstanced calls of
+    the instanced pipelines (e.g. InstancedModelViewProjectionShaderProgram)"""
+
+    # 4x4 model matrix + rgb color => 16*4 + 3*4 = 76 bytes
+    STRIDE = 19
+
+    def __init__(self):
+        self.vbo = GL.glGenBuffers(1)
+        self.count = 0
+        # (pipeline, GPUShape) -> VAO drawing the shape with the instance attributes
+        self.vaos = {}
+
+    def fill(self, transforms, colors=None, usage=None):
+        """transforms: (n, 4, 4) row major matrices, as built by transformations.
+        colors: (n, 3) colors multiplying the ones of the shape, white by default."""
+
+        transforms = np.asarray(transforms, dtype=np.float32).reshape(-1, 4, 4)
+        self.count = len(transforms)
+
+        instanceData = np.ones((self.count, self.STRIDE), dtype=np.float32)
+        # Attribute matrices are read column by column
+        instanceData[:, :16] = transforms.transpose(0, 2, 1).reshape(-1, 16)
+        if colors is not None:
+            instanceData[:, 16:] = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, instanceData.nbytes, instanceData,
+            GL.GL_DYNAMIC_DRAW if usage is None else usage)
+
+    def attach(self, pipeline, gpuShape):
+        """VAO of gpuShape with the instance attributes of this buffer, created
+        the first time. It uses the buffers of the shape but not its VAO, which
+        keeps drawing a single copy. If the shape gets new buffers, clear this one."""
+        key = (pipeline, gpuShape)
+        vao = self.vaos.get(key)
+        if vao is None:
+            instanced = GPUShape()
+            instanced.vao = GL.glGenVertexArrays(1)
+            instanced.vbo = gpuShape.vbo
+            instanced.ebo = gpuShape.ebo
+            pipeline.setupVAO(instanced)
+
+            GL.glBindVertexArray(instanced.vao)
+            self.setupAttributes(pipeline)
+            GL.glBindVertexArray(0)
+
+            vao = self.vaos[key] = instanced.vao
+        return vao
+
+    def setupAttributes(self, pipeline):
+        """Points the instanceModel and instanceColor attributes of the bound VAO to this buffer"""
+
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.vbo)
+        stride = self.STRIDE * SIZE_IN_BYTES
+
+        # A mat4 attribute takes 4 consecutive locations, one per column
+        model = pipeline.getAttribLocation("instanceModel")
+        for column in range(4):
+            GL.glVertexAttribPointer(model + column, 4, GL.GL_FLOAT, GL.GL_FALSE, stride, ctypes.c_void_p(16 * column))
+            GL.glEnableVertexAttribArray(model + column)
+            GL.glVertexAttribDivisor(model + column, 1)
+
+        color = pipeline.getAttribLocation("instanceColor")
+        GL.glVertexAttribPointer(color, 3, GL.GL_FLOAT, GL.GL_FALSE, stride, ctypes.c_void_p(64))
+        GL.glEnableVertexAttribArray(color)
+        GL.glVertexAttribDivisor(color, 1)
+
+    def clear(self):
+        """Freeing GPU memory"""
+
+        if self.vaos:
+            GL.glDeleteVertexArrays(len(self.vaos), list(self.vaos.values()))
+            self.vaos = {}
+
+        if self.vbo != None:
+            GL.glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
 
 
 def createGPUShape(pipeline, shape):
@@ -79,5 +206,5 @@ def createGPUShape(pipeline, shape):
     """
     gpuShape = GPUShape().initBuffers()
     pipeline.setupVAO(gpuShape)
-    gpuShape.fillBuffers(shape.vertices, shape.indices, GL_STATIC_DRAW)
+    gpuShape.fillBuffers(shape.vertices, shape.indices, GL.GL_STATIC_DRAW)
     return gpuShape
@@ -0,0 +1,29 @@
+# coding=utf-8
+"""Deferred access to the OpenGL bindings, loaded on first use.
+
+    from grafica.lazy_gl import GL
+    GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbo)
+
+Importing PyOpenGL is slow, modules that are also useful without a GL context
+(scene graphs, shapes, text geometry) use GL instead of "from OpenGL.GL import *"
+so they can be imported by tools that never draw.
+"""
+
+import importlib
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        value = getattr(importlib.import_module(self._name), attribute)
+        # Stored in the instance, next lookups do not reach __getattr__
+        setattr(self, attribute, value)
+        return value
+
+
+GL = LazyModule("OpenGL.GL")
@@ -4,13 +4,14 @@
 from OpenGL.GL import *
 import OpenGL.GL.shaders
 from grafica.gpu_shape import GPUShape
+from grafica.shader_program import ShaderProgram
 
 import sys
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from grafica.assets_path import getAssetPath
 
-class SimpleFlatShaderProgram():
+class SimpleFlatShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -89,9 +90,7 @@ class SimpleFlatShaderProgram():
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -102,15 +101,15 @@ class SimpleFlatShaderProgram():
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
         glEnableVertexAttribArray(normal)
 
@@ -129,7 +128,7 @@ class SimpleFlatShaderProgram():
         glBindVertexArray(0)
 
 
-class SimpleTextureFlatShaderProgram():
+class SimpleTextureFlatShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -215,9 +214,7 @@ class SimpleTextureFlatShaderProgram():
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -228,15 +225,15 @@ class SimpleTextureFlatShaderProgram():
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "texCoords")
+        color = self.getAttribLocation("texCoords")
         glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
         glEnableVertexAttribArray(normal)
 
@@ -257,7 +254,7 @@ class SimpleTextureFlatShaderProgram():
         glBindVertexArray(0)
 
 
-class SimpleGouraudShaderProgram():
+class SimpleGouraudShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -336,9 +333,7 @@ class SimpleGouraudShaderProgram():
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -349,15 +344,15 @@ class SimpleGouraudShaderProgram():
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
         glEnableVertexAttribArray(normal)
 
@@ -376,7 +371,7 @@ class SimpleGouraudShaderProgram():
         glBindVertexArray(0)
 
 
-class SimpleTextureGouraudShaderProgram():
+class SimpleTextureGouraudShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -462,9 +457,7 @@ class SimpleTextureGouraudShaderProgram():
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -475,15 +468,15 @@ class SimpleTextureGouraudShaderProgram():
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "texCoords")
+        color = self.getAttribLocation("texCoords")
         glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
         glEnableVertexAttribArray(normal)
 
@@ -504,7 +497,7 @@ class SimpleTextureGouraudShaderProgram():
         glBindVertexArray(0)
 
 
-class SimplePhongShaderProgram:
+class SimplePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -589,9 +582,7 @@ class SimplePhongShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -602,15 +593,15 @@ class SimplePhongShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
         glEnableVertexAttribArray(normal)
 
@@ -629,7 +620,7 @@ class SimplePhongShaderProgram:
         glBindVertexArray(0)
 
 
-class SimpleTexturePhongShaderProgram:
+class SimpleTexturePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         vertex_shader = """
@@ -718,9 +709,7 @@ class SimpleTexturePhongShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -731,15 +720,15 @@ class SimpleTexturePhongShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "texCoords")
+        color = self.getAttribLocation("texCoords")
         glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
         glEnableVertexAttribArray(normal)
 
@@ -759,8 +748,270 @@ class SimpleTexturePhongShaderProgram:
         # Unbind the current VAO
         glBindVertexArray(0)
 
+
+class InstancedPhongShaderProgram(ShaderProgram):
+    """SimplePhongShaderProgram drawing many copies of a shape in a single call,
+    each one with its model transform and color from an InstanceBuffer"""
+
+    def __init__(self):
+        vertex_shader = """
+            #version 330 core
+
+            layout (location = 0) in vec3 position;
+            layout (location = 1) in vec3 color;
+            layout (location = 2) in vec3 normal;
+            in mat4 instanceModel;
+            in vec3 instanceColor;
+
+            out vec3 fragPosition;
+            out vec3 fragOriginalColor;
+            out vec3 fragNormal;
+
+            uniform mat4 view;
+            uniform mat4 projection;
+
+            void main()
+            {
+                fragPosition = vec3(instanceModel * vec4(position, 1.0));
+                fragOriginalColor = color * instanceColor;
+                fragNormal = mat3(transpose(inverse(instanceModel))) * normal;  
+                
+                gl_Position = projection * view * vec4(fragPosition, 1.0);
+            }
+            """
+
+        fragment_shader = """
+            #version 330 core
+
+            out vec4 fragColor;
+
+            in vec3 fragNormal;
+            in vec3 fragPosition;
+            in vec3 fragOriginalColor;
+            
+            uniform vec3 lightPosition; 
+            uniform vec3 viewPosition;
+            uniform vec3 La;
+            uniform vec3 Ld;
+            uniform vec3 Ls;
+            uniform vec3 Ka;
+            uniform vec3 Kd;
+            uniform vec3 Ks;
+            uniform uint shininess;
+            uniform float constantAttenuation;
+            uniform float linearAttenuation;
+            uniform float quadraticAttenuation;
+
+            void main()
+            {
+                // ambient
+                vec3 ambient = Ka * La;
+                
+                // diffuse
+                // fragment normal has been interpolated, so it does not necessarily have norm equal to 1
+                vec3 normalizedNormal = normalize(fragNormal);
+                vec3 toLight = lightPosition - fragPosition;
+                vec3 lightDir = normalize(toLight);
+                float diff = max(dot(normalizedNormal, lightDir), 0.0);
+                vec3 diffuse = Kd * Ld * diff;
+                
+                // specular
+                vec3 viewDir = normalize(viewPosition - fragPosition);
+                vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
+                float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
+                vec3 specular = Ks * Ls * spec;
+
+                // attenuation
+                float distToLight = length(toLight);
+                float attenuation = constantAttenuation
+                    + linearAttenuation * distToLight
+                    + quadraticAttenuation * distToLight * distToLight;
+                    
+                vec3 result = (ambient + ((diffuse + specular) / attenuation)) * fragOriginalColor;
+                fragColor = vec4(result, 1.0);
+            }
+            """
+
+        # Binding artificial vertex array object for validation
+        VAO = glGenVertexArrays(1)
+        glBindVertexArray(VAO)
+
+
+        self.compile(vertex_shader, fragment_shader)
+
+
+    def setupVAO(self, gpuShape):
+
+        glBindVertexArray(gpuShape.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+
+        # 3d vertices + rgb color + 3d normals => 3*4 + 3*4 + 3*4 = 36 bytes
+        position = self.getAttribLocation("position")
+        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(position)
+        
+        color = self.getAttribLocation("color")
+        glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
+        glEnableVertexAttribArray(color)
+
+        normal = self.getAttribLocation("normal")
+        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
+        glEnableVertexAttribArray(normal)
+
+        # Unbinding current vao
+        glBindVertexArray(0)
+
+
+    def drawInstanced(self, gpuShape, instanceBuffer, mode=GL_TRIANGLES):
+        assert isinstance(gpuShape, GPUShape)
+
+        # Binding the VAO with the instance attributes, created once per shape, and executing the draw call
+        glBindVertexArray(instanceBuffer.attach(self, gpuShape))
+        glDrawElementsInstanced(mode, gpuShape.size, GL_UNSIGNED_INT, None, instanceBuffer.count)
+
+        # Unbind the current VAO
+        glBindVertexArray(0)
+
+
+class InstancedTexturePhongShaderProgram(ShaderProgram):
+    """SimpleTexturePhongShaderProgram drawing many copies of a shape in a single
+    call, each one with its model transform and a color tinting the texture from an InstanceBuffer"""
+
+    def __init__(self):
+        vertex_shader = """
+            #version 330 core
+            
+            in vec3 position;
+            in vec2 texCoords;
+            in vec3 normal;
+            in mat4 instanceModel;
+            in vec3 instanceColor;
+
+            out vec3 fragPosition;
+            out vec3 fragInstanceColor;
+            out vec2 fragTexCoords;
+            out vec3 fragNormal;
+
+            uniform mat4 view;
+            uniform mat4 projection;
+
+            void main()
+            {
+                fragPosition = vec3(instanceModel * vec4(position, 1.0));
+                fragTexCoords = texCoords;
+                fragInstanceColor = instanceColor;
+                fragNormal = mat3(transpose(inverse(instanceModel))) * normal;  
+                
+                gl_Position = projection * view * vec4(fragPosition, 1.0);
+            }
+            """
+
+        fragment_shader = """
+            #version 330 core
+
+            in vec3 fragNormal;
+            in vec3 fragPosition;
+            in vec2 fragTexCoords;
+            in vec3 fragInstanceColor;
+
+            out vec4 fragColor;
+            
+            uniform vec3 lightPosition; 
+            uniform vec3 viewPosition; 
+            uniform vec3 La;
+            uniform vec3 Ld;
+            uniform vec3 Ls;
+            uniform vec3 Ka;
+            uniform vec3 Kd;
+            uniform vec3 Ks;
+            uniform uint shininess;
+            uniform float constantAttenuation;
+            uniform float linearAttenuation;
+            uniform float quadraticAttenuation;
+
+            uniform sampler2D samplerTex;
+
+            void main()
+            {
+                // ambient
+                vec3 ambient = Ka * La;
+                
+                // diffuse
+                // fragment normal has been interpolated, so it does not necessarily have norm equal to 1
+                vec3 normalizedNormal = normalize(fragNormal);
+                vec3 toLight = lightPosition - fragPosition;
+                vec3 lightDir = normalize(toLight);
+                float diff = max(dot(normalizedNormal, lightDir), 0.0);
+                vec3 diffuse = Kd * Ld * diff;
+                
+                // specular
+                vec3 viewDir = normalize(viewPosition - fragPosition);
+                vec3 reflectDir = reflect(-lightDir, normalizedNormal);  
+                float spec = pow(max(dot(viewDir, reflectDir), 0.0), shininess);
+                vec3 specular = Ks * Ls * spec;
+
+                // attenuation
+                float distToLight = length(toLight);
+                float attenuation = constantAttenuation
+                    + linearAttenuation * distToLight
+                    + quadraticAttenuation * distToLight * distToLight;
+                    
+                vec4 fragOriginalColor = texture(samplerTex, fragTexCoords);
+
+                vec3 result = (ambient + ((diffuse + specular) / attenuation)) * fragOriginalColor.rgb * fragInstanceColor;
+                fragColor = vec4(result, 1.0);
+            }
+            """
+
+        # Binding artificial vertex array object for validation
+        VAO = glGenVertexArrays(1)
+        glBindVertexArray(VAO)
+
+
+        self.compile(vertex_shader, fragment_shader)
+
+
+    def setupVAO(self, gpuShape):
+
+        glBindVertexArray(gpuShape.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+
+        # 3d vertices + rgb color + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
+        position = self.getAttribLocation("position")
+        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(position)
+        
+        color = self.getAttribLocation("texCoords")
+        glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
+        glEnableVertexAttribArray(color)
+
+        normal = self.getAttribLocation("normal")
+        glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
+        glEnableVertexAttribArray(normal)
+
+        # Unbinding current vao
+        glBindVertexArray(0)
+
+
+    def drawInstanced(self, gpuShape, instanceBuffer, mode=GL_TRIANGLES):
+        assert isinstance(gpuShape, GPUShape)
+
+        # Binding the VAO with the instance attributes, created once per shape, and executing the draw call
+        glBindVertexArray(instanceBuffer.attach(self, gpuShape))
+        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+
+        glDrawElementsInstanced(mode, gpuShape.size, GL_UNSIGNED_INT, None, instanceBuffer.count)
+
+        # Unbind the current VAO
+        glBindVertexArray(0)
+
+
 #TAREA4: Se crea este nuevo shader para usar múltiples luces con texturas
-class MultipleLightTexturePhongShaderProgram:
+class MultipleLightTexturePhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         #TAREA4: Ahora los shaders están en archivos de texto independientes, se leen aquí
@@ -775,9 +1026,7 @@ class MultipleLightTexturePhongShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -788,15 +1037,15 @@ class MultipleLightTexturePhongShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "texCoords")
+        color = self.getAttribLocation("texCoords")
         glVertexAttribPointer(color, 2, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 32, ctypes.c_void_p(20))
         glEnableVertexAttribArray(normal)
 
@@ -817,7 +1066,7 @@ class MultipleLightTexturePhongShaderProgram:
         glBindVertexArray(0)
 
 #TAREA4: Se crea este shader para soportar geometría con color y múltiples luces
-class MultipleLightPhongShaderProgram:
+class MultipleLightPhongShaderProgram(ShaderProgram):
 
     def __init__(self):
         #TAREA4: Ahora los shaders están en archivos de texto independientes, aquí los leemos
@@ -832,9 +1081,7 @@ class MultipleLightPhongShaderProgram:
         glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
@@ -845,15 +1092,15 @@ class MultipleLightPhongShaderProgram:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + rgb color + 3d normals => 3*4 + 2*4 + 3*4 = 32 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
+        position = self.getAttribLocation("position")
         glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
         glEnableVertexAttribArray(position)
         
-        color = glGetAttribLocation(self.shaderProgram, "color")
+        color = self.getAttribLocation("color")
         glVertexAttribPointer(color, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(12))
         glEnableVertexAttribArray(color)
 
-        normal = glGetAttribLocation(self.shaderProgram, "normal")
+        normal = self.getAttribLocation("normal")
         glVertexAttribPointer(normal, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(24))
         glEnableVertexAttribArray(normal)
 
@@ -0,0 +1,216 @@
+# coding=utf-8
+"""Many shapes sharing one VAO, vertex buffer and index buffer.
+
+Shapes with the same vertex layout (the same pipeline) are stored in ranges of
+two large buffers. Drawing them binds the VAO once:
+
+    arena = MeshArena(pipeline, strideSize=6)
+    quad = arena.add(bs.createColorQuad(1, 0, 0))
+    cube = arena.add(bs.createRainbowCube())
+
+    arena.bind()
+    for transform in transforms:
+        glUniformMatrix4fv(pipeline.getUniformLocation("transform"), 1, GL_TRUE, transform)
+        arena.draw(quad)
+    arena.unbind()
+
+Indices are stored as in each shape, starting at 0, and drawn with
+glDrawElementsBaseVertex. Buffers grow when full, and removed shapes leave
+holes that are compacted when an allocation does not fit. Shapes may be added
+while the arena is bound: add() and compact() bind it again when they finish.
+"""
+
+import ctypes
+from grafica.lazy_gl import GL
+from grafica.gpu_shape import GPUShape, SIZE_IN_BYTES
+import numpy as np
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+
+class RangeAllocator:
+    """First fit allocation of ranges of [0, capacity)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.free = [(0, capacity)]  # (offset, size) sorted by offset
+        self.used = 0
+
+    def allocate(self, size):
+        """Offset of a new range, or None when no hole is large enough"""
+        for i, (offset, freeSize) in enumerate(self.free):
+            if freeSize >= size:
+                if freeSize == size:
+                    del self.free[i]
+                else:
+                    self.free[i] = (offset + size, freeSize - size)
+                self.used += size
+                return offset
+        return None
+
+    def release(self, offset, size):
+        """Frees a range, merging it with its neighbour holes"""
+        i = 0
+        while i < len(self.free) and self.free[i][0] < offset:
+            i += 1
+        self.free.insert(i, (offset, size))
+        self.used -= size
+
+        if i + 1 < len(self.free) and offset + size == self.free[i + 1][0]:
+            self.free[i] = (offset, size + self.free[i + 1][1])
+            del self.free[i + 1]
+        if i > 0 and self.free[i - 1][0] + self.free[i - 1][1] == offset:
+            self.free[i - 1] = (self.free[i - 1][0], self.free[i - 1][1] + self.free[i][1])
+            del self.free[i]
+
+
+class ArenaShape:
+    """A shape stored in a MeshArena, ranges measured in vertices and indices"""
+
+    def __init__(self, arena, baseVertex, vertexCount, firstIndex, size):
+        self.arena = arena
+        self.baseVertex = baseVertex
+        self.vertexCount = vertexCount
+        self.firstIndex = firstIndex
+        self.size = size
+
+
+class MeshArena:
+    """
+    pipeline: shader program whose setupVAO defines the vertex layout.
+    strideSize: floats per vertex in that layout.
+    """
+
+    def __init__(self, pipeline, strideSize, vertexCapacity=65536, indexCapacity=131072, usage=None):
+        self.pipeline = pipeline
+        self.strideSize = strideSize
+        self.usage = GL.GL_DYNAMIC_DRAW if usage is None else usage
+        self.shapes = []
+        self.bound = False
+
+        self.gpuShape = GPUShape().initBuffers()
+        self._allocate(self.gpuShape, vertexCapacity, indexCapacity)
+        pipeline.setupVAO(self.gpuShape)
+
+        self.vertices = RangeAllocator(vertexCapacity)
+        self.indices = RangeAllocator(indexCapacity)
+
+    def _allocate(self, gpuShape, vertexCapacity, indexCapacity):
+        # The element buffer binding is stored in the bound VAO, which must not change
+        GL.glBindVertexArray(0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, gpuShape.vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, vertexCapacity * self.strideSize * SIZE_IN_BYTES, None, self.usage)
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+        GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, indexCapacity * SIZE_IN_BYTES, None, self.usage)
+
+    def add(self, shape):
+        """Copies the vertices and indices of a basic_shapes.Shape into the arena"""
+        vertexData = np.ascontiguousarray(shape.vertices, dtype=np.float32)
+        indexData = np.ascontiguousarray(shape.indices, dtype=np.uint32)
+        vertexCount = vertexData.size // self.strideSize
+
+        baseVertex = self.vertices.allocate(vertexCount)
+        firstIndex = self.indices.allocate(indexData.size)
+        if baseVertex is None or firstIndex is None:
+            if baseVertex is not None:
+                self.vertices.release(baseVertex, vertexCount)
+            if firstIndex is not None:
+                self.indices.release(firstIndex, indexData.size)
+            self._makeRoom(vertexCount, indexData.size)
+            baseVertex = self.vertices.allocate(vertexCount)
+            firstIndex = self.indices.allocate(indexData.size)
+
+        vertexBytes = self.strideSize * SIZE_IN_BYTES
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.gpuShape.vbo)
+        GL.glBufferSubData(GL.GL_ARRAY_BUFFER, baseVertex * vertexBytes, vertexData.nbytes, vertexData)
+        # The element buffer is bound to the VAO, bind it without changing the VAO state
+        GL.glBindVertexArray(0)
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.gpuShape.ebo)
+        GL.glBufferSubData(GL.GL_ELEMENT_ARRAY_BUFFER, firstIndex * SIZE_IN_BYTES, indexData.nbytes, indexData)
+        self._restoreBinding()
+
+        arenaShape = ArenaShape(self, baseVertex, vertexCount, firstIndex, indexData.size)
+        self.shapes.append(arenaShape)
+        return arenaShape
+
+    def remove(self, arenaShape):
+        """Frees the ranges of a shape, it can not be drawn anymore"""
+        self.shapes.remove(arenaShape)
+        self.vertices.release(arenaShape.baseVertex, arenaShape.vertexCount)
+        self.indices.release(arenaShape.firstIndex, arenaShape.size)
+        arenaShape.arena = None
+
+    def _makeRoom(self, vertexCount, indexCount):
+        """Compacts the arena, growing it if the holes are not enough"""
+        vertexCapacity = self.vertices.capacity
+        while vertexCapacity - self.vertices.used < vertexCount:
+            vertexCapacity *= 2
+        indexCapacity = self.indices.capacity
+        while indexCapacity - self.indices.used < indexCount:
+            indexCapacity *= 2
+        self.compact(vertexCapacity, indexCapacity)
+
+    def compact(self, vertexCapacity=None, indexCapacity=None):
+        """Moves all the shapes to the start of new buffers, leaving a single hole at the end"""
+        vertexCapacity = vertexCapacity or self.vertices.capacity
+        indexCapacity = indexCapacity or self.indices.capacity
+        vertexBytes = self.strideSize * SIZE_IN_BYTES
+
+        packed = GPUShape().initBuffers()
+        self._allocate(packed, vertexCapacity, indexCapacity)
+
+        # Copies between buffers stay on the GPU
+        GL.glBindVertexArray(0)
+        baseVertex = firstIndex = 0
+        for arenaShape in self.shapes:
+            GL.glBindBuffer(GL.GL_COPY_READ_BUFFER, self.gpuShape.vbo)
+            GL.glBindBuffer(GL.GL_COPY_WRITE_BUFFER, packed.vbo)
+            GL.glCopyBufferSubData(GL.GL_COPY_READ_BUFFER, GL.GL_COPY_WRITE_BUFFER,
+                arenaShape.baseVertex * vertexBytes, baseVertex * vertexBytes, arenaShape.vertexCount * vertexBytes)
+            GL.glBindBuffer(GL.GL_COPY_READ_BUFFER, self.gpuShape.ebo)
+            GL.glBindBuffer(GL.GL_COPY_WRITE_BUFFER, packed.ebo)
+            GL.glCopyBufferSubData(GL.GL_COPY_READ_BUFFER, GL.GL_COPY_WRITE_BUFFER,
+                arenaShape.firstIndex * SIZE_IN_BYTES, firstIndex * SIZE_IN_BYTES, arenaShape.size * SIZE_IN_BYTES)
+
+            arenaShape.baseVertex = baseVertex
+            arenaShape.firstIndex = firstIndex
+            baseVertex += arenaShape.vertexCount
+            firstIndex += arenaShape.size
+
+        # The VAO is kept, pointing now to the new buffers
+        GL.glDeleteVertexArrays(1, [packed.vao])
+        packed.vao = self.gpuShape.vao
+        self.gpuShape.vao = None
+        self.gpuShape.clear()
+        self.gpuShape = packed
+        self.pipeline.setupVAO(self.gpuShape)
+
+        self.vertices = RangeAllocator(vertexCapacity)
+        self.vertices.allocate(baseVertex)
+        self.indices = RangeAllocator(indexCapacity)
+        self.indices.allocate(firstIndex)
+        self._restoreBinding()
+
+    def _restoreBinding(self):
+        """Binds the VAO again if the arena was bound before being modified"""
+        if self.bound:
+            GL.glBindVertexArray(self.gpuShape.vao)
+
+    def bind(self):
+        GL.glBindVertexArray(self.gpuShape.vao)
+        self.bound = True
+
+    def unbind(self):
+        GL.glBindVertexArray(0)
+        self.bound = False
+
+    def draw(self, arenaShape, mode=None):
+        """Draws a shape of the arena, which must be bound"""
+        GL.glDrawElementsBaseVertex(GL.GL_TRIANGLES if mode is None else mode, arenaShape.size, GL.GL_UNSIGNED_INT,
+            ctypes.c_void_p(arenaShape.firstIndex * SIZE_IN_BYTES), arenaShape.baseVertex)
+
+    def clear(self):
+        """Freeing GPU memory"""
+        self.gpuShape.clear()
+        self.shapes = []
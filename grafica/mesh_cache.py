@@ -0,0 +1,127 @@
+# coding=utf-8
+"""Binary cache of the arrays parsed from mesh files.
+
+The cache of "assets/auto.off" is stored next to it, as "assets/auto.off.<variant>.meshcache":
+    64 bytes header: magic, version, metadata position, source mtime, size and sha1
+    raw arrays, each one aligned to 64 bytes
+    metadata: json with the name, dtype, shape and offset of every array
+
+It is valid while the source keeps its modification time and size, or its
+contents when those changed (e.g. after a git checkout), in which case the new
+modification time and size are recorded. Arrays are loaded with
+np.memmap, they are read-only views of the file and no parsing is done.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import numpy as np
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+MAGIC = b"GRAFMESH"
+VERSION = 1
+ALIGNMENT = 64
+
+# magic, version, metadata offset and length, source mtime (ns), source size, source sha1
+_HEADER = struct.Struct("<8sIQIqQ20s")
+_HEADER_SIZE = 64
+
+
+def cachePath(sourcePath, variant):
+    return os.fspath(sourcePath) + "." + variant + ".meshcache"
+
+
+def _fileHash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def load(sourcePath, variant):
+    """Dictionary with the cached arrays, or None if there is no valid cache"""
+    path = cachePath(sourcePath, variant)
+    try:
+        source = os.stat(sourcePath)
+        with open(path, "rb") as f:
+            magic, version, metadataOffset, metadataLength, mtime, size, sha1 = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                return None
+            touched = (mtime, size) != (source.st_mtime_ns, source.st_size)
+            if touched and sha1 != _fileHash(sourcePath):
+                return None
+            f.seek(metadataOffset)
+            metadata = json.loads(f.read(metadataLength))
+
+        if touched:
+            _refreshHeader(path, metadataOffset, metadataLength, source, sha1)
+
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+    except (OSError, ValueError, struct.error):
+        return None
+
+    arrays = {}
+    for entry in metadata["arrays"]:
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        offset = entry["offset"]
+        arrays[entry["name"]] = data[offset:offset + count * dtype.itemsize].view(dtype).reshape(entry["shape"])
+    return arrays
+
+
+def _refreshHeader(path, metadataOffset, metadataLength, source, sha1):
+    """Records the new mtime and size of an unchanged source, so its hash is not computed again"""
+    header = _HEADER.pack(MAGIC, VERSION, metadataOffset, metadataLength, source.st_mtime_ns, source.st_size, sha1)
+    try:
+        with open(path, "r+b") as f:
+            f.write(header)
+    except OSError:
+        pass
+
+
+def store(sourcePath, variant, arrays):
+    """Writes the arrays, a dictionary name: array, as the cache of sourcePath.
+    Failures, e.g. a read-only assets folder, are ignored."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    entries = []
+    offset = _HEADER_SIZE
+    for name, array in arrays.items():
+        entries.append({"name": name, "dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        offset = _align(offset + array.nbytes)
+    metadataOffset = offset
+    metadata = json.dumps({"arrays": entries}).encode()
+
+    try:
+        source = os.stat(sourcePath)
+        header = _HEADER.pack(
+            MAGIC, VERSION, metadataOffset, len(metadata), source.st_mtime_ns, source.st_size, _fileHash(sourcePath))
+
+        # Written aside and renamed, a concurrent reader never sees half a file
+        path = cachePath(sourcePath, variant)
+        temporaryPath = path + ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+        with open(temporaryPath, "wb") as f:
+            f.write(header.ljust(_HEADER_SIZE, b"\0"))
+            for entry, array in zip(entries, arrays.values()):
+                f.seek(entry["offset"])
+                f.write(array.tobytes())
+            f.seek(metadataOffset)
+            f.write(metadata)
+        os.replace(temporaryPath, path)
+    except OSError:
+        pass
+
+
+def cached(sourcePath, variant, loader):
+    """Arrays of sourcePath from its cache, or from loader() which are then cached"""
+    arrays = load(sourcePath, variant)
+    if arrays is None:
+        arrays = loader()
+        store(sourcePath, variant, arrays)
+    return arrays
@@ -0,0 +1,26 @@
+# coding=utf-8
+"""Mipmap levels computed on the CPU, without OpenGL.
+
+Used by textures.texture_2D_setup (mipmaps="box") and by the offline DDS
+converter in compressed_textures, which must not load PyOpenGL.
+"""
+
+import numpy as np
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+
+def box_filter_mipmaps(data):
+    """All mipmap levels of a (height, width, channels) uint8 image, each one
+    averaging 2x2 texels of the previous (an odd last row or column is dropped)"""
+    levels = [data]
+    level = data.astype(np.float32)
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        height, width = level.shape[:2]
+        if height > 1:
+            level = 0.5 * (level[0:height - 1:2] + level[1:height:2])
+        if width > 1:
+            level = 0.5 * (level[:, 0:width - 1:2] + level[:, 1:width:2])
+        levels.append(np.round(level).astype(np.uint8))
+    return levels
@@ -0,0 +1,216 @@
+# coding=utf-8
+"""Quaternions and dual quaternions to represent and interpolate rotations.
+
+A quaternion is stored as a float32 array [w, x, y, z].
+A dual quaternion is stored as a (2, 4) array [real, dual], where real is the
+rotation and dual encodes the translation.
+Every function also accepts stacks, (..., 4) and (..., 2, 4), so thousands of
+orientations can be processed with a single call.
+"""
+
+import numpy as np
+
+
+def identity():
+    return np.array([1, 0, 0, 0], dtype=np.float32)
+
+
+def fromAxisAngle(axis, theta):
+    """Rotation of theta radians around a unit axis, same convention as tr.rotationA"""
+    axis = np.asarray(axis, dtype=np.float32)
+    halfTheta = 0.5 * np.asarray(theta, dtype=np.float32)
+    sinHalf = np.sin(halfTheta)[..., None]
+
+    w = np.cos(halfTheta)
+    xyz = axis * sinHalf
+    w, xyz = np.broadcast_arrays(w[..., None], xyz)
+    return np.concatenate([w[..., :1], xyz], axis=-1).astype(np.float32)
+
+
+def conjugate(q):
+    q = np.array(q, dtype=np.float32)
+    q[..., 1:] *= -1
+    return q
+
+
+def norm(q):
+    return np.linalg.norm(q, axis=-1)
+
+
+def normalize(q):
+    q = np.asarray(q, dtype=np.float32)
+    return q / norm(q)[..., None]
+
+
+def multiply(q1, q2):
+    """Hamilton product q1 * q2, i.e. rotating by q2 first and then by q1"""
+    q1 = np.asarray(q1, dtype=np.float32)
+    q2 = np.asarray(q2, dtype=np.float32)
+    w1, x1, y1, z1 = q1[..., 0], q1[..., 1], q1[..., 2], q1[..., 3]
+    w2, x2, y2, z2 = q2[..., 0], q2[..., 1], q2[..., 2], q2[..., 3]
+
+    return np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2], axis=-1)
+
+
+def rotateVector(q, v):
+    """Rotates 3d vectors v by unit quaternions q"""
+    q = np.asarray(q, dtype=np.float32)
+    v = np.asarray(v, dtype=np.float32)
+    w = q[..., :1]
+    xyz = q[..., 1:]
+
+    # v' = v + 2w (xyz x v) + 2 xyz x (xyz x v)
+    t = 2 * np.cross(xyz, v)
+    return v + w * t + np.cross(xyz, t)
+
+
+def toMatrix(q, out=None):
+    """4x4 rotation matrix of unit quaternions q, as used in grafica.transformations"""
+    q = np.asarray(q, dtype=np.float32)
+    w, x, y, z = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+
+    if out is None:
+        out = np.zeros(q.shape[:-1] + (4, 4), dtype=np.float32)
+    else:
+        out[...] = 0
+
+    out[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    out[..., 0, 1] = 2 * (x * y - w * z)
+    out[..., 0, 2] = 2 * (x * z + w * y)
+    out[..., 1, 0] = 2 * (x * y + w * z)
+    out[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    out[..., 1, 2] = 2 * (y * z - w * x)
+    out[..., 2, 0] = 2 * (x * z - w * y)
+    out[..., 2, 1] = 2 * (y * z + w * x)
+    out[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    out[..., 3, 3] = 1
+    return out
+
+
+def fromMatrix(M):
+    """Unit quaternions of the rotation part of 4x4 (or 3x3) matrices without scale"""
+    M = np.asarray(M, dtype=np.float32)
+    m00, m01, m02 = M[..., 0, 0], M[..., 0, 1], M[..., 0, 2]
+    m10, m11, m12 = M[..., 1, 0], M[..., 1, 1], M[..., 1, 2]
+    m20, m21, m22 = M[..., 2, 0], M[..., 2, 1], M[..., 2, 2]
+
+    # The four possible solutions, one of them is numerically stable: the one
+    # built from the largest diagonal term (Shepperd's method)
+    candidates = np.stack([
+        np.stack([1 + m00 + m11 + m22, m21 - m12, m02 - m20, m10 - m01], axis=-1),
+        np.stack([m21 - m12, 1 + m00 - m11 - m22, m01 + m10, m02 + m20], axis=-1),
+        np.stack([m02 - m20, m01 + m10, 1 - m00 + m11 - m22, m12 + m21], axis=-1),
+        np.stack([m10 - m01, m02 + m20, m12 + m21, 1 - m00 - m11 + m22], axis=-1)], axis=-2)
+
+    diagonal = np.stack([m00 + m11 + m22, m00, m11, m22], axis=-1)
+    best = np.argmax(diagonal, axis=-1)
+    q = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+    return normalize(q)
+
+
+def _alignHemisphere(q0, q1):
+    """Flips q1 where needed so the interpolation takes the shortest path"""
+    dot = np.sum(q0 * q1, axis=-1)
+    sign = np.where(dot < 0, -1, 1).astype(np.float32)
+    return q1 * sign[..., None], dot * sign
+
+
+def nlerp(q0, q1, t):
+    """Normalized linear interpolation, cheaper than slerp but not constant speed"""
+    q0 = np.asarray(q0, dtype=np.float32)
+    q1, _ = _alignHemisphere(q0, np.asarray(q1, dtype=np.float32))
+    t = np.asarray(t, dtype=np.float32)[..., None]
+    return normalize(q0 + t * (q1 - q0))
+
+
+def slerp(q0, q1, t):
+    """Spherical linear interpolation between unit quaternions.
+    q0, q1 and t are broadcasted, e.g. N keyframe pairs with N parameters,
+    or a single pair sampled at N parameters."""
+    q0 = np.asarray(q0, dtype=np.float32)
+    q1, dot = _alignHemisphere(q0, np.asarray(q1, dtype=np.float32))
+    t = np.asarray(t, dtype=np.float32)
+
+    # Almost parallel quaternions have sin(angle) ~ 0, nlerp is accurate there
+    nearlyParallel = dot > 0.9995
+    angle = np.arccos(np.clip(dot, -1, 1))
+    sinAngle = np.where(nearlyParallel, 1, np.sin(angle))
+
+    w0 = np.where(nearlyParallel, 1 - t, np.sin((1 - t) * angle) / sinAngle)
+    w1 = np.where(nearlyParallel, t, np.sin(t * angle) / sinAngle)
+    return normalize(w0[..., None] * q0 + w1[..., None] * q1)
+
+
+def sampleKeyframes(times, keyframes, t, interpolation=slerp):
+    """Samples a rotation track at times t.
+    times: (K,) increasing keyframe times
+    keyframes: (K, 4) quaternions, or (K, N, 4) for N tracks sharing the same times
+    t: scalar or array of sample times, clamped to the track range"""
+    times = np.asarray(times, dtype=np.float32)
+    keyframes = np.asarray(keyframes, dtype=np.float32)
+    t = np.clip(np.asarray(t, dtype=np.float32), times[0], times[-1])
+
+    index = np.clip(np.searchsorted(times, t, side="right") - 1, 0, len(times) - 2)
+    t0 = times[index]
+    t1 = times[index + 1]
+    localT = (t - t0) / (t1 - t0)
+
+    if keyframes.ndim == 3:
+        localT = localT[..., None]
+    return interpolation(keyframes[index], keyframes[index + 1], localT)
+
+
+# Dual quaternions: rotation q followed by translation t is
+#     real = q, dual = 0.5 * (0, t) * q
+
+def dualFromRotationTranslation(q, t):
+    q = np.asarray(q, dtype=np.float32)
+    t = np.asarray(t, dtype=np.float32)
+    q, t = np.broadcast_arrays(q, np.concatenate([np.zeros_like(t[..., :1]), t], axis=-1))
+    return np.stack([q, 0.5 * multiply(t, q)], axis=-2).astype(np.float32)
+
+
+def dualFromMatrix(M):
+    M = np.asarray(M, dtype=np.float32)
+    return dualFromRotationTranslation(fromMatrix(M), M[..., :3, 3])
+
+
+def dualTranslation(dq):
+    dq = np.asarray(dq, dtype=np.float32)
+    return 2 * multiply(dq[..., 1, :], conjugate(dq[..., 0, :]))[..., 1:]
+
+
+def dualToMatrix(dq, out=None):
+    dq = np.asarray(dq, dtype=np.float32)
+    out = toMatrix(dq[..., 0, :], out)
+    out[..., :3, 3] = dualTranslation(dq)
+    return out
+
+
+def dualMultiply(dq1, dq2):
+    """Composition dq1 * dq2, i.e. applying dq2 first and then dq1"""
+    dq1 = np.asarray(dq1, dtype=np.float32)
+    dq2 = np.asarray(dq2, dtype=np.float32)
+    real = multiply(dq1[..., 0, :], dq2[..., 0, :])
+    dual = multiply(dq1[..., 0, :], dq2[..., 1, :]) + multiply(dq1[..., 1, :], dq2[..., 0, :])
+    return np.stack([real, dual], axis=-2)
+
+
+def dualNormalize(dq):
+    dq = np.asarray(dq, dtype=np.float32)
+    realNorm = norm(dq[..., 0, :])[..., None, None]
+    return dq / realNorm
+
+
+def dualNlerp(dq0, dq1, t):
+    """Dual quaternion linear blending between rigid transforms"""
+    dq0 = np.asarray(dq0, dtype=np.float32)
+    dq1 = np.asarray(dq1, dtype=np.float32)
+    dot = np.sum(dq0[..., 0, :] * dq1[..., 0, :], axis=-1)
+    sign = np.where(dot < 0, -1, 1).astype(np.float32)
+    t = np.asarray(t, dtype=np.float32)[..., None, None]
+    return dualNormalize(dq0 + t * (dq1 * sign[..., None, None] - dq0))
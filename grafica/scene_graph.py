@@ -1,27 +1,128 @@
 # coding=utf-8
 """A simple scene graph class and functionality"""
 
-from OpenGL.GL import *
-import OpenGL.GL.shaders
+import itertools
+from grafica.lazy_gl import GL
 import numpy as np
 import grafica.transformations as tr
 import grafica.gpu_shape as gs
+from grafica.shader_program import getUniformLocation
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
 
+# Incremented every time any node is renamed or its childs change.
+# Name indices compare against it to know when they must be rebuilt.
+_structureVersion = 0
+
+
+def _structureChanged():
+    global _structureVersion
+    _structureVersion += 1
+
+
+# Stamps identify the value of a world transform: a new one is taken every
+# time a world transform is computed. 0 is reserved for _IDENTITY.
+_stamps = itertools.count(1)
+
+
+class _ChildList(list):
+    """A list of childs that reports every modification"""
+
+    def _notifying(method):
+        def wrapper(self, *args, **kwargs):
+            _structureChanged()
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    append = _notifying(list.append)
+    extend = _notifying(list.extend)
+    insert = _notifying(list.insert)
+    remove = _notifying(list.remove)
+    pop = _notifying(list.pop)
+    clear = _notifying(list.clear)
+    sort = _notifying(list.sort)
+    reverse = _notifying(list.reverse)
+    __setitem__ = _notifying(list.__setitem__)
+    __delitem__ = _notifying(list.__delitem__)
+    __iadd__ = _notifying(list.__iadd__)
+    __imul__ = _notifying(list.__imul__)
+
+    del _notifying
+
+
 class SceneGraphNode:
     """
     A simple class to handle a scene graph
     Each node represents a group of objects
     Each leaf represents a basic figure (GPUShape)
     To identify each node properly, it MUST have a unique name
+
+    The world transform of each node is cached, once per parent. It is only
+    recomputed when the node transform is assigned, or when the world transform
+    of its parent was recomputed. In place modifications of transform (e.g.
+    node.transform[:] = M or tr.translate(x, y, z, out=node.transform)) are not
+    detected: assign a new matrix or call invalidate() after them.
     """
     def __init__(self, name):
-        self.name = name
-        self.transform = tr.identity()
-        self.childs = []
+        self._name = name
+        self._transform = tr.identity()
+        self._childs = _ChildList()
+
+        # Cached world transforms: parent key -> (parent stamp, world transform, stamp)
+        self._worldTransforms = {}
+
+        # Name index used when this node is the root of a search
+        self._index = None
+        self._indexVersion = -1
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        _structureChanged()
+
+    @property
+    def childs(self):
+        return self._childs
+
+    @childs.setter
+    def childs(self, value):
+        if value is not self._childs:
+            self._childs = _ChildList(value)
+            _structureChanged()
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, value):
+        self._transform = value
+        self.invalidate()
+
+    def invalidate(self):
+        """Forces the world transform of this subtree to be recomputed.
+        Children are invalidated implicitly: they receive a new parent stamp."""
+        self._worldTransforms.clear()
+
+    def worldTransform(self, parentTransform, parentStamp=None, parentKey=None):
+        """Returns parentTransform @ transform and the stamp of the result.
+        parentStamp identifies the value of parentTransform, None if unknown,
+        which always recomputes. parentKey tells apart the parents of a node
+        reachable through several paths, each one has its own cached result."""
+        cached = self._worldTransforms.get(parentKey)
+        if cached is not None and parentStamp is not None and cached[0] == parentStamp:
+            return cached[1], cached[2]
+
+        worldTransform = np.matmul(parentTransform, self._transform)
+        stamp = next(_stamps)
+        self._worldTransforms[parentKey] = (parentStamp, worldTransform, stamp)
+        return worldTransform, stamp
 
     def clear(self):
         """Freeing GPU memory"""
@@ -30,51 +131,78 @@ class SceneGraphNode:
             child.clear()
 
             
+# Shared default, so all functions hit the same cached world transforms.
+# Other parent transforms may be modified in place by the caller, so they
+# have no stamp and the world transforms below them are always recomputed.
+_IDENTITY = tr.identity()
+
+
+def _parentStamp(parentTransform):
+    return 0 if parentTransform is _IDENTITY else None
+
+
+def _buildNameIndex(root):
+    """Maps each name below root to its path of nodes, starting at root.
+    Nodes are visited in the same depth first order as a recursive search,
+    so the first node with a repeated name wins."""
+    index = {}
+    pending = [(root, (root,))]
+
+    while pending:
+        node, path = pending.pop()
+        if isinstance(node, gs.GPUShape):
+            continue
+
+        index.setdefault(node.name, path)
+
+        # Reversed, so the first child is the next one to be visited
+        for child in reversed(node.childs):
+            pending.append((child, path + (child,)))
+
+    return index
 
-    
-def findNode(node, name):
 
-    # The name was not found in this path
+def findPath(node, name):
+    """Returns the nodes from node down to the node called name, or None.
+    The index behind this lookup is rebuilt only after the graph changes."""
+
     if isinstance(node, gs.GPUShape):
         return None
 
-    # This is the requested node
-    if node.name == name:
-        return node
-    
-    # All childs are checked for the requested name
-    for child in node.childs:
-        foundNode = findNode(child, name)
-        if foundNode != None:
-            return foundNode
-
-    # No child of this node had the requested name
-    return None
+    if node._indexVersion != _structureVersion:
+        node._index = _buildNameIndex(node)
+        node._indexVersion = _structureVersion
 
+    return node._index.get(name)
 
-def findTransform(node, name, parentTransform=tr.identity()):
 
-    # The name was not found in this path
-    if isinstance(node, gs.GPUShape):
+def findNode(node, name):
+
+    path = findPath(node, name)
+    if path is None:
         return None
 
-    newTransform = np.matmul(parentTransform, node.transform)
+    return path[-1]
 
-    # This is the requested node
-    if node.name == name:
-        return newTransform
-    
-    # All childs are checked for the requested name
-    for child in node.childs:
-        foundTransform = findTransform(child, name, newTransform)
-        if isinstance(foundTransform, (np.ndarray, np.generic) ):
-            return foundTransform
 
-    # No child of this node had the requested name
-    return None
+def findTransform(node, name, parentTransform=_IDENTITY):
+
+    path = findPath(node, name)
+    if path is None:
+        return None
 
+    # Composing the transformations only through the path to the requested node
+    newTransform, stamp = parentTransform, _parentStamp(parentTransform)
+    parentKey = None
+    for pathNode in path:
+        newTransform, stamp = pathNode.worldTransform(newTransform, stamp, parentKey)
+        parentKey = id(pathNode)
 
-def findPosition(node, name, parentTransform=tr.identity()):
+    # A copy is returned to protect the cache
+    return newTransform.copy()
+
+
+def findPosition(node, name, parentTransform=_IDENTITY):
     foundTransform = findTransform(node, name, parentTransform)
 
     if isinstance(foundTransform, (np.ndarray, np.generic) ):
@@ -85,22 +213,116 @@ def findPosition(node, name, parentTransform=tr.identity()):
     return None
 
 
-def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identity()):
+def drawSceneGraphNode(node, pipeline, transformName, parentTransform=_IDENTITY):
     assert(isinstance(node, SceneGraphNode))
 
-    # Composing the transformations through this path
-    newTransform = np.matmul(parentTransform, node.transform)
+    transformLocation = getUniformLocation(pipeline, transformName)
+    _drawNode(node, pipeline, transformLocation, parentTransform, _parentStamp(parentTransform), None)
+
+
+def _drawNode(node, pipeline, transformLocation, parentTransform, parentStamp, parentKey):
+
+    # Composing the transformations through this path, cached when nothing changed
+    newTransform, stamp = node.worldTransform(parentTransform, parentStamp, parentKey)
 
     # If the child node is a leaf, it should be a GPUShape.
     # Hence, it can be drawn with drawCall
     if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
         leaf = node.childs[0]
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
+        GL.glUniformMatrix4fv(transformLocation, 1, GL.GL_TRUE, newTransform)
         pipeline.drawCall(leaf)
 
     # If the child node is not a leaf, it MUST be a SceneGraphNode,
     # so this draw function is called recursively
     else:
+        nodeKey = id(node)
         for child in node.childs:
-            drawSceneGraphNode(child, pipeline, transformName, newTransform)
+            _drawNode(child, pipeline, transformLocation, newTransform, stamp, nodeKey)
+
+
+
+class CompiledSceneGraph:
+    """
+    Flattened copy of a scene graph, to draw big scenes without recursion.
+    Nodes are stored in level order (every parent before its childs):
+        nodes: the SceneGraphNode of each entry
+        parents: index of the parent entry, -1 for the root
+        localTransforms: (N, 4, 4) transform of each entry
+        worldTransforms: (N, 4, 4) composed transforms, see computeWorldTransforms
+        leaves: (entry index, GPUShape) pairs to draw
+    A node reachable through several paths gets one entry per path.
+    The structure is not updated automatically: compile the graph again after
+    adding or removing nodes. Transforms can be refreshed with syncTransforms,
+    or written directly into localTransforms.
+    """
+    def __init__(self, root):
+        nodes = []
+        parents = []
+        levels = []
+        leaves = []
+
+        # Breadth first traversal, one level at a time
+        currentLevel = [(root, -1)]
+        while currentLevel:
+            levelStart = len(nodes)
+            nextLevel = []
+            for node, parent in currentLevel:
+                index = len(nodes)
+                nodes.append(node)
+                parents.append(parent)
+
+                if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
+                    leaves.append((index, node.childs[0]))
+                else:
+                    nextLevel += [(child, index) for child in node.childs]
+
+            levels.append(slice(levelStart, len(nodes)))
+            currentLevel = nextLevel
+
+        self.nodes = nodes
+        self.parents = np.array(parents, dtype=np.int32)
+        self.levels = levels
+        self.leaves = leaves
+        self.localTransforms = np.empty((len(nodes), 4, 4), dtype=np.float32)
+        self.worldTransforms = np.empty((len(nodes), 4, 4), dtype=np.float32)
+        self._indices = {}
+        for index, node in enumerate(nodes):
+            self._indices.setdefault(node.name, index)
+
+        self.syncTransforms()
+        self.computeWorldTransforms()
+
+    def indexOf(self, name):
+        """Entry index of the first node called name, to write localTransforms directly"""
+        return self._indices[name]
+
+    def syncTransforms(self):
+        """Copies the current transform of every node into localTransforms"""
+        np.stack([node.transform for node in self.nodes], out=self.localTransforms)
+
+    def computeWorldTransforms(self, parentTransform=_IDENTITY):
+        """One batched matrix product per level of the graph.
+        Levels are contiguous, so each one is written in place through a slice"""
+        root = self.levels[0]
+        np.matmul(parentTransform, self.localTransforms[root], out=self.worldTransforms[root])
+
+        for level in self.levels[1:]:
+            np.matmul(
+                self.worldTransforms[self.parents[level]],
+                self.localTransforms[level],
+                out=self.worldTransforms[level])
+
+        return self.worldTransforms
+
+    def draw(self, pipeline, transformName):
+        """Draws every leaf using the latest computed world transforms"""
+        transformLocation = getUniformLocation(pipeline, transformName)
+        worldTransforms = self.worldTransforms
+
+        for index, leaf in self.leaves:
+            GL.glUniformMatrix4fv(transformLocation, 1, GL.GL_TRUE, worldTransforms[index])
+            pipeline.drawCall(leaf)
+
 
+def compileSceneGraph(root):
+    return CompiledSceneGraph(root)
@@ -0,0 +1,234 @@
+# coding=utf-8
+"""Base class for the shader programs, caching compiled programs, uniform and attribute locations"""
+
+from grafica.lazy_gl import GL
+import numpy as np
+import hashlib
+import os
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+
+class ShaderProgram:
+    """
+    Common functionality for the shader program classes.
+    Subclasses call compile() with their sources: the GL program is shared by
+    every instance using the same sources, and every uniform and attribute
+    location is queried only once.
+
+    The setUniform* methods skip the upload when the uniform already holds
+    the same value. They assume the program is in use (glUseProgram) and
+    that its uniforms are only written through them; if you call glUniform*
+    directly, call forgetUniformValues() afterwards.
+    """
+
+    def compile(self, vertexSource, fragmentSource):
+        self.shaderProgram = compileProgram(vertexSource, fragmentSource)
+        self.cacheLocations()
+
+    def cacheLocations(self):
+        # Instances sharing a program must also share what its uniforms hold
+        state = _programStates.get(self.shaderProgram)
+        if state is not None:
+            self.uniformLocations, self.attributeLocations, self._uniformValues = state
+            return
+
+        self.uniformLocations = {}
+        self.attributeLocations = {}
+        self._uniformValues = {}
+        _programStates[self.shaderProgram] = (self.uniformLocations, self.attributeLocations, self._uniformValues)
+
+        for index in range(GL.glGetProgramiv(self.shaderProgram, GL.GL_ACTIVE_UNIFORMS)):
+            name, size, _ = GL.glGetActiveUniform(self.shaderProgram, index)
+            name = name.decode()
+            location = GL.glGetUniformLocation(self.shaderProgram, name)
+            self.uniformLocations[name] = location
+
+            # Arrays are reported as "name[0]", they can also be accessed as "name"
+            if name.endswith("[0]"):
+                self.uniformLocations[name[:-3]] = location
+
+        for index in range(GL.glGetProgramiv(self.shaderProgram, GL.GL_ACTIVE_ATTRIBUTES)):
+            name, _, _ = GL.glGetActiveAttrib(self.shaderProgram, index)
+            name = name.decode()
+            self.attributeLocations[name] = GL.glGetAttribLocation(self.shaderProgram, name)
+
+    def getUniformLocation(self, name):
+        """Cached glGetUniformLocation. Names not reported as active, such as
+        "lights[3]", are queried once and cached as well."""
+        location = self.uniformLocations.get(name)
+        if location is None:
+            location = GL.glGetUniformLocation(self.shaderProgram, name)
+            self.uniformLocations[name] = location
+        return location
+
+    def getAttribLocation(self, name):
+        location = self.attributeLocations.get(name)
+        if location is None:
+            location = GL.glGetAttribLocation(self.shaderProgram, name)
+            self.attributeLocations[name] = location
+        return location
+
+    def forgetUniformValues(self):
+        """Next setUniform* calls will upload their values unconditionally"""
+        self._uniformValues.clear()
+
+    def _changed(self, location, value):
+        """Registers value as the one held by location, returns False if it was already there"""
+        if location == -1 or self._uniformValues.get(location) == value:
+            return False
+        self._uniformValues[location] = value
+        return True
+
+    def setUniform1i(self, name, value):
+        location = self.getUniformLocation(name)
+        if self._changed(location, int(value)):
+            GL.glUniform1i(location, value)
+
+    def setUniform1ui(self, name, value):
+        location = self.getUniformLocation(name)
+        if self._changed(location, int(value)):
+            GL.glUniform1ui(location, value)
+
+    def setUniform1f(self, name, value):
+        location = self.getUniformLocation(name)
+        if self._changed(location, float(value)):
+            GL.glUniform1f(location, value)
+
+    def setUniform3f(self, name, x, y, z):
+        location = self.getUniformLocation(name)
+        if self._changed(location, (float(x), float(y), float(z))):
+            GL.glUniform3f(location, x, y, z)
+
+    def setUniform3fv(self, name, value):
+        self.setUniform3f(name, *value[:3])
+
+    def setUniform4f(self, name, x, y, z, w):
+        location = self.getUniformLocation(name)
+        if self._changed(location, (float(x), float(y), float(z), float(w))):
+            GL.glUniform4f(location, x, y, z, w)
+
+    def setUniform4fv(self, name, value):
+        self.setUniform4f(name, *value[:4])
+
+    def setUniformMatrix3(self, name, matrix):
+        """Uploads a row major 3x3 matrix, as the ones in grafica.transformations"""
+        location = self.getUniformLocation(name)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if self._changed(location, matrix.tobytes()):
+            GL.glUniformMatrix3fv(location, 1, GL.GL_TRUE, matrix)
+
+    def setUniformMatrix4(self, name, matrix):
+        """Uploads a row major 4x4 matrix, as the ones in grafica.transformations"""
+        location = self.getUniformLocation(name)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if self._changed(location, matrix.tobytes()):
+            GL.glUniformMatrix4fv(location, 1, GL.GL_TRUE, matrix)
+
+
+def getUniformLocation(pipeline, name):
+    """Uses the location cache when the pipeline has one, e.g. for user defined pipelines"""
+    if isinstance(pipeline, ShaderProgram):
+        return pipeline.getUniformLocation(name)
+    return GL.glGetUniformLocation(pipeline.shaderProgram, name)
+
+
+# Process wide caches: programs by the hash of their sources, and the
+# location/value caches of each program
+_programs = {}
+_programStates = {}
+_binaryCacheDirectory = None
+
+
+def setProgramBinaryCache(directory):
+    """Stores linked program binaries in directory, so later runs skip the GLSL
+    compilation. Does nothing if the driver does not support glGetProgramBinary.
+    Use None to disable it."""
+    global _binaryCacheDirectory
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _binaryCacheDirectory = directory
+
+
+def clearProgramCache():
+    """Deletes every cached program, e.g. before destroying the GL context"""
+    for program in _programs.values():
+        GL.glDeleteProgram(program)
+    _programs.clear()
+    _programStates.clear()
+
+
+def _sourceKey(vertexSource, fragmentSource):
+    # Sources may come as strings or as lists of lines (readlines)
+    digest = hashlib.sha256()
+    for source in (vertexSource, fragmentSource):
+        digest.update((source if isinstance(source, str) else "".join(source)).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _binaryCachePath(key):
+    if _binaryCacheDirectory is None or GL.glGetIntegerv(GL.GL_NUM_PROGRAM_BINARY_FORMATS) == 0:
+        return None
+
+    # Binaries are only valid for the driver that produced them
+    driver = hashlib.sha256(GL.glGetString(GL.GL_RENDERER) + GL.glGetString(GL.GL_VERSION)).hexdigest()[:16]
+    return os.path.join(_binaryCacheDirectory, key + "_" + driver + ".bin")
+
+
+def _loadProgramBinary(path):
+    try:
+        with open(path, "rb") as f:
+            binaryFormat = int.from_bytes(f.read(4), "little")
+            binary = np.frombuffer(f.read(), dtype=np.uint8)
+    except OSError:
+        return None
+
+    from OpenGL.GL.shaders import ShaderProgram as GLProgram
+    from OpenGL.error import GLError
+
+    program = GLProgram(GL.glCreateProgram())
+    try:
+        return program.load(binaryFormat, binary)
+    except (RuntimeError, GLError):
+        # Stale or corrupt binary, it will be compiled and stored again
+        GL.glDeleteProgram(program)
+        return None
+
+
+def _storeProgramBinary(path, program):
+    binaryFormat, binary = program.retrieve()
+    try:
+        with open(path, "wb") as f:
+            f.write(int(binaryFormat).to_bytes(4, "little"))
+            f.write(np.asarray(binary).tobytes())
+    except OSError:
+        pass
+
+
+def compileProgram(vertexSource, fragmentSource):
+    """Compiles and links a program, or returns the one already built from the
+    same sources. The program is validated, so a VAO must be bound."""
+    key = _sourceKey(vertexSource, fragmentSource)
+    program = _programs.get(key)
+    if program is not None:
+        return program
+
+    binaryPath = _binaryCachePath(key)
+    if binaryPath is not None:
+        program = _loadProgramBinary(binaryPath)
+
+    if program is None:
+        from OpenGL.GL import shaders
+
+        program = shaders.compileProgram(
+            shaders.compileShader(vertexSource, GL.GL_VERTEX_SHADER),
+            shaders.compileShader(fragmentSource, GL.GL_FRAGMENT_SHADER),
+            retrievable=binaryPath is not None)
+
+        if binaryPath is not None:
+            _storeProgramBinary(binaryPath, program)
+
+    _programs[key] = program
+    return program
@@ -4,12 +4,13 @@ Simple Text Renderer using OpenGL Textures
 Font: IBM text mode 8x8
 """
 
-from OpenGL.GL import *
-import OpenGL.GL.shaders
+import ctypes
 import numpy as np
 import grafica.basic_shapes as bs
-import grafica.easy_shaders as es
+from grafica.gpu_shape import GPUShape
+from grafica.lazy_gl import GL
 import grafica.font8x8_basic as f88
+from grafica.shader_program import ShaderProgram
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -47,19 +48,19 @@ def toOpenGLTexture(textBitsTexture):
     data = np.copy(textBitsTexture)
     data.reshape((8*8*128,1), order='C')
 
-    texture = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_3D, texture)
+    texture = GL.glGenTextures(1)
+    GL.glBindTexture(GL.GL_TEXTURE_3D, texture)
 
     # texture wrapping params
-    glTexParameteri(GL_TEXTURE_3D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-    glTexParameteri(GL_TEXTURE_3D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-    glTexParameteri(GL_TEXTURE_3D, GL_TEXTURE_WRAP_R, GL_CLAMP_TO_EDGE)
+    GL.glTexParameteri(GL.GL_TEXTURE_3D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+    GL.glTexParameteri(GL.GL_TEXTURE_3D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+    GL.glTexParameteri(GL.GL_TEXTURE_3D, GL.GL_TEXTURE_WRAP_R, GL.GL_CLAMP_TO_EDGE)
 
     # texture filtering params
-    glTexParameteri(GL_TEXTURE_3D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_3D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    GL.glTexParameteri(GL.GL_TEXTURE_3D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST)
+    GL.glTexParameteri(GL.GL_TEXTURE_3D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST)
 
-    glTexImage3D(GL_TEXTURE_3D, 0, GL_RED, 128, 8, 8, 0, GL_RED, GL_UNSIGNED_BYTE, data)
+    GL.glTexImage3D(GL.GL_TEXTURE_3D, 0, GL.GL_RED, 128, 8, 8, 0, GL.GL_RED, GL.GL_UNSIGNED_BYTE, data)
 
     return texture
 
@@ -104,7 +105,7 @@ def textToShape(text, charWidth, charHeight):
 
 
 
-class TextureTextRendererShaderProgram:
+class TextureTextRendererShaderProgram(ShaderProgram):
 
     def __init__(self):
 
@@ -152,43 +153,45 @@ class TextureTextRendererShaderProgram:
             """
 
         # Binding artificial vertex array object for validation
-        VAO = glGenVertexArrays(1)
-        glBindVertexArray(VAO)
+        VAO = GL.glGenVertexArrays(1)
+        GL.glBindVertexArray(VAO)
 
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.compile(vertex_shader, fragment_shader)
 
 
     def setupVAO(self, gpuShape):
-        glBindVertexArray(gpuShape.vao)
+        GL.glBindVertexArray(gpuShape.vao)
 
-        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, gpuShape.vbo)
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
 
         # 3d vertices + 3d texture coordinates => 3*4 + 3*4 = 24 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
+        position = self.getAttribLocation("position")
+        GL.glVertexAttribPointer(position, 3, GL.GL_FLOAT, GL.GL_FALSE, 24, ctypes.c_void_p(0))
+        GL.glEnableVertexAttribArray(position)
         
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
-        glVertexAttribPointer(texCoords, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
-        glEnableVertexAttribArray(texCoords)
+        texCoords = self.getAttribLocation("texCoords")
+        GL.glVertexAttribPointer(texCoords, 3, GL.GL_FLOAT, GL.GL_FALSE, 24, ctypes.c_void_p(12))
+        GL.glEnableVertexAttribArray(texCoords)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        GL.glBindVertexArray(0)
 
 
-    def drawCall(self, gpuShape, mode=GL_TRIANGLES):
-        assert isinstance(gpuShape, es.GPUShape)
+    def drawCall(self, gpuShape, mode=None):
+        assert isinstance(gpuShape, GPUShape)
+
+        # GL_TRIANGLES by default, not in the signature so importing this module does not load OpenGL
+        if mode is None:
+            mode = GL.GL_TRIANGLES
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_3D, gpuShape.texture)
-        glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
+        GL.glBindVertexArray(gpuShape.vao)
+        GL.glBindTexture(GL.GL_TEXTURE_3D, gpuShape.texture)
+        GL.glDrawElements(mode, gpuShape.size, GL.GL_UNSIGNED_INT, None)
         
         # Unbind the current VAO
-        glBindVertexArray(0)
+        GL.glBindVertexArray(0)
 
 
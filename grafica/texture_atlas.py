@@ -0,0 +1,136 @@
+# coding=utf-8
+"""Packing many small images into a single texture, a texture atlas.
+
+Meshes using any of the packed images can share one texture, so drawing them
+needs a single bind. Their texture coordinates are remapped to the region of
+their image:
+
+    atlas = TextureAtlas({"roof": "assets/roof1.jpg", "wall": "assets/wall1.jpg"})
+    texture = atlas.upload()
+    roofUVs = atlas.remapUVs("roof", roofUVs)
+
+upload() returns the GL texture id, as textures.texture_2D_setup. For the
+auxiliares.utils scene graph, texture() returns a drawables.Texture instead:
+
+    scene.add_node("roof", mesh=roof, pipeline=pipeline, texture=atlas.texture())
+
+Texture coordinates follow the texture_2D_setup convention, with the image
+flipped so (0, 0) is its bottom left corner. Remapped coordinates must stay in
+[0, 1]: repeating a texture (GL_REPEAT) is not possible inside an atlas.
+"""
+
+import numpy as np
+from PIL import Image
+
+__author__ = "Daniel Calderon"
+__license__ = "MIT"
+
+
+def _shelfPack(sizes, width):
+    """Positions (x, y) for rectangles of the given (width, height) sizes, placed
+    left to right in rows (shelves) of the given width. Returns them and the total height."""
+    positions = [None] * len(sizes)
+    x = y = shelfHeight = 0
+
+    # Taller rectangles first, so each shelf wastes little space
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i][1]):
+        w, h = sizes[index]
+        if x + w > width:
+            x = 0
+            y += shelfHeight
+            shelfHeight = 0
+        positions[index] = (x, y)
+        x += w
+        shelfHeight = max(shelfHeight, h)
+
+    return positions, y + shelfHeight
+
+
+class TextureAtlas:
+    """
+    images: dictionary name -> PIL image or path.
+    padding: pixels around each image repeating its border, so linear
+        filtering does not sample the neighbours.
+    maxSize: maximum width and height of the atlas.
+    maxImageSize: if given, images with a larger side are scaled down to it.
+    """
+
+    def __init__(self, images, padding=2, maxSize=4096, maxImageSize=None):
+        self.names = list(images)
+        arrays = []
+        for name in self.names:
+            image = images[name]
+            if not isinstance(image, Image.Image):
+                image = Image.open(image)
+            if maxImageSize is not None and max(image.size) > maxImageSize:
+                scale = maxImageSize / max(image.size)
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+            arrays.append(np.asarray(image.convert("RGBA"), dtype=np.uint8))
+
+        # Same mode as texture_2D_setup expects, RGBA only when needed
+        opaque = all(np.all(array[:, :, 3] == 255) for array in arrays)
+        channels = 3 if opaque else 4
+
+        sizes = [(array.shape[1] + 2 * padding, array.shape[0] + 2 * padding) for array in arrays]
+
+        # Power of two width, from the widest image to maxSize, wasting the least area
+        width = 1
+        while width < max(w for w, _ in sizes):
+            width *= 2
+        best = None
+        while width <= maxSize:
+            positions, height = _shelfPack(sizes, width)
+            if height <= maxSize and (best is None or width * height < best[0] * best[1]):
+                best = width, height, positions
+            width *= 2
+        if best is None:
+            raise ValueError("Images do not fit in a %dx%d atlas" % (maxSize, maxSize))
+        width, height, positions = best
+
+        atlas = np.zeros((height, width, channels), dtype=np.uint8)
+        self.regions = {}
+        for name, array, (x, y) in zip(self.names, arrays, positions):
+            padded = np.pad(array[:, :, :channels], ((padding, padding), (padding, padding), (0, 0)), mode="edge")
+            atlas[y:y + padded.shape[0], x:x + padded.shape[1]] = padded
+
+            # Pixel rectangle of the image, measured from the top left corner
+            left, top = x + padding, y + padding
+            right, bottom = left + array.shape[1], top + array.shape[0]
+
+            # Texture coordinates once flipped: v grows from the bottom
+            self.regions[name] = (
+                left / width, 1 - bottom / height,
+                right / width, 1 - top / height)
+
+        self.image = Image.fromarray(atlas, "RGB" if channels == 3 else "RGBA")
+        self.width = width
+        self.height = height
+
+    def uvTransform(self, name):
+        """Scale and offset taking texture coordinates of the image to the atlas"""
+        u0, v0, u1, v1 = self.regions[name]
+        return np.array([u1 - u0, v1 - v0], dtype=np.float32), np.array([u0, v0], dtype=np.float32)
+
+    def remapUVs(self, name, uvs):
+        """uvs: flat [u0, v0, u1, v1, ...] list or (n, 2) array. Returns a new array with the same shape."""
+        scale, offset = self.uvTransform(name)
+        uvs = np.asarray(uvs, dtype=np.float32)
+        return (uvs.reshape(-1, 2) * scale + offset).reshape(uvs.shape)
+
+    def remapShape(self, name, shape, stride, uvOffset):
+        """Remaps in place the texture coordinates of an array based shape
+        (see basic_shapes.toArrays), stored at uvOffset of each vertex"""
+        scale, offset = self.uvTransform(name)
+        vertices = shape.vertices.reshape(-1, stride)
+        vertices[:, uvOffset:uvOffset + 2] = vertices[:, uvOffset:uvOffset + 2] * scale + offset
+
+    def upload(self, **kwargs):
+        """GL texture of the atlas, kwargs are passed to texture_2D_setup"""
+        from grafica.textures import texture_2D_setup
+        return texture_2D_setup(self.image, **kwargs)
+
+    def texture(self, **kwargs):
+        """auxiliares.utils.drawables.Texture of the atlas, with bind() and
+        unbind() as SceneGraph nodes expect, kwargs are passed to Texture"""
+        from auxiliares.utils.drawables import Texture
+        return Texture(image=self.image, **kwargs)
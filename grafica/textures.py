@@ -2,6 +2,7 @@ from OpenGL.GL import (
     glGenTextures,
     GL_TEXTURE_2D,
     glTexParameteri,
+    glTexParameterf,
     GL_TEXTURE_MIN_FILTER,
     GL_TEXTURE_MAG_FILTER,
     glBindTexture,
@@ -15,24 +16,81 @@ from OpenGL.GL import (
     GL_LINEAR,
     GL_NEAREST,
     GL_REPEAT,
+    glGenBuffers,
+    glBindBuffer,
+    glBufferData,
+    glBufferSubData,
+    glDeleteBuffers,
+    glPixelStorei,
+    GL_PIXEL_UNPACK_BUFFER,
+    GL_STREAM_DRAW,
+    GL_UNPACK_ALIGNMENT,
+    glGenerateMipmap,
+    glGetFloatv,
+    GL_LINEAR_MIPMAP_LINEAR,
+    GL_LINEAR_MIPMAP_NEAREST,
+    GL_NEAREST_MIPMAP_LINEAR,
+    GL_NEAREST_MIPMAP_NEAREST,
+    GL_TEXTURE_MAX_ANISOTROPY,
+    GL_MAX_TEXTURE_MAX_ANISOTROPY,
 )
+from OpenGL.error import GLError
 
 from PIL import Image
 import numpy as np
 
+from grafica.mipmaps import box_filter_mipmaps
+
 SIZE_IN_BYTES = 4
 
 
+# Trilinear filtering: linear inside each mipmap level and between levels
+TRILINEAR = GL_LINEAR_MIPMAP_LINEAR
+
+MIPMAP_FILTERS = (
+    GL_LINEAR_MIPMAP_LINEAR,
+    GL_LINEAR_MIPMAP_NEAREST,
+    GL_NEAREST_MIPMAP_LINEAR,
+    GL_NEAREST_MIPMAP_NEAREST,
+)
+
+
+def set_anisotropy(anisotropy):
+    """Anisotropic filtering for the bound texture, clamped to what the driver
+    supports. Ignored when it is not available (core since OpenGL 4.6)."""
+    try:
+        maxAnisotropy = glGetFloatv(GL_MAX_TEXTURE_MAX_ANISOTROPY)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY, min(anisotropy, float(maxAnisotropy)))
+    except GLError:
+        pass
+
+
 def texture_2D_setup(
     image,
     sWrapMode=GL_CLAMP_TO_EDGE,
     tWrapMode=GL_CLAMP_TO_EDGE,
     minFilterMode=GL_LINEAR,
     maxFilterMode=GL_LINEAR,
-    flip_top_bottom=True
+    flip_top_bottom=True,
+    mipmaps=None,
+    anisotropy=1.0,
+    max_size=None
 ):
     # wrapMode: GL_REPEAT, GL_CLAMP_TO_EDGE
-    # filterMode: GL_LINEAR, GL_NEAREST
+    # filterMode: GL_LINEAR, GL_NEAREST, and for minFilterMode also the mipmap
+    #   modes, e.g. TRILINEAR
+    # mipmaps: "gpu" (glGenerateMipmap), "box" (box filtered with numpy) or
+    #   False, only valid when minFilterMode does not sample mipmaps. By default
+    #   they are generated on the GPU when minFilterMode needs them
+    # anisotropy: maximum anisotropic filtering, e.g. 8 or 16 for floors and
+    #   other surfaces seen at grazing angles
+    # max_size: larger images are scaled down to fit it, keeping their aspect ratio
+    if mipmaps is None:
+        mipmaps = "gpu" if minFilterMode in MIPMAP_FILTERS else False
+    elif not mipmaps and minFilterMode in MIPMAP_FILTERS:
+        # Without mipmaps the texture would be incomplete and sample black
+        raise ValueError("minFilterMode samples mipmaps, it needs mipmaps=\"gpu\" or \"box\"")
+
     texture = glGenTextures(1)
     glBindTexture(GL_TEXTURE_2D, texture)
 
@@ -43,6 +101,13 @@ def texture_2D_setup(
     # texture filtering params
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, minFilterMode)
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, maxFilterMode)
+    if anisotropy > 1:
+        set_anisotropy(anisotropy)
+
+    if max_size is not None and max(image.size) > max_size:
+        scale = max_size / max(image.size)
+        size = (max(1, round(image.size[0] * scale)), max(1, round(image.size[1] * scale)))
+        image = image.resize(size, Image.BOX)
 
     if flip_top_bottom:
         image = image.transpose(Image.FLIP_TOP_BOTTOM)
@@ -58,16 +123,129 @@ def texture_2D_setup(
         print("Image mode not supported.")
         raise Exception()
 
-    glTexImage2D(
-        GL_TEXTURE_2D,
-        0,
-        internalFormat,
-        image.size[0],
-        image.size[1],
-        0,
-        format,
-        GL_UNSIGNED_BYTE,
-        img_data,
-    )
+    # Rows are tightly packed, RGB images may not have 4 bytes aligned rows
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+    if mipmaps == "box":
+        for level, data in enumerate(box_filter_mipmaps(img_data)):
+            glTexImage2D(
+                GL_TEXTURE_2D,
+                level,
+                internalFormat,
+                data.shape[1],
+                data.shape[0],
+                0,
+                format,
+                GL_UNSIGNED_BYTE,
+                data,
+            )
+    else:
+        glTexImage2D(
+            GL_TEXTURE_2D,
+            0,
+            internalFormat,
+            image.size[0],
+            image.size[1],
+            0,
+            format,
+            GL_UNSIGNED_BYTE,
+            img_data,
+        )
+        if mipmaps:
+            glGenerateMipmap(GL_TEXTURE_2D)
+
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
 
     return texture
+
+
+class StreamingTexture:
+    """
+    Texture uploaded in steps, so loading a large image does not stall a frame.
+    Call update() once per frame: each call copies the next rows of the image,
+    at most bytesPerUpdate, into a pixel buffer object. When the buffer is
+    complete the texture is specified from it, that copy happens on the GPU
+    without blocking the application.
+    Until then, texture holds a 1x1 placeholder of placeholderColor, so it can
+    be bound and drawn from the beginning; its id does not change.
+
+    The image must be already decoded (e.g. with auxiliares.utils.loader),
+    PIL images and uint8 numpy arrays (height, width, 3 or 4) are accepted.
+    """
+
+    def __init__(
+        self,
+        image,
+        sWrapMode=GL_CLAMP_TO_EDGE,
+        tWrapMode=GL_CLAMP_TO_EDGE,
+        minFilterMode=GL_LINEAR,
+        maxFilterMode=GL_LINEAR,
+        flip_top_bottom=True,
+        bytesPerUpdate=4 * 1024 * 1024,
+        placeholderColor=(128, 128, 128, 255)
+    ):
+        data = np.asarray(image, dtype=np.uint8)
+        if flip_top_bottom:
+            data = data[::-1]
+
+        if data.ndim != 3 or data.shape[2] not in (3, 4):
+            print("Image mode not supported.")
+            raise Exception()
+
+        self.data = data
+        self.format = GL_RGB if data.shape[2] == 3 else GL_RGBA
+        self.height, self.width = data.shape[:2]
+        self.rowSize = self.width * data.shape[2]
+        self.rowsPerUpdate = max(1, bytesPerUpdate // self.rowSize)
+        self.nextRow = 0
+        self.done = False
+        self.mipmaps = minFilterMode in MIPMAP_FILTERS
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, sWrapMode)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, tWrapMode)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, minFilterMode)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, maxFilterMode)
+
+        placeholder = np.array(placeholderColor, dtype=np.uint8)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, 1, 0, GL_RGBA, GL_UNSIGNED_BYTE, placeholder)
+
+        self.pbo = glGenBuffers(1)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, self.pbo)
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, self.height * self.rowSize, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def update(self):
+        """Uploads the next chunk, returns True once the texture is complete"""
+        if self.done:
+            return True
+
+        firstRow = self.nextRow
+        lastRow = min(firstRow + self.rowsPerUpdate, self.height)
+        chunk = np.ascontiguousarray(self.data[firstRow:lastRow])
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, self.pbo)
+        glBufferSubData(GL_PIXEL_UNPACK_BUFFER, firstRow * self.rowSize, chunk.nbytes, chunk)
+        self.nextRow = lastRow
+
+        if self.nextRow == self.height:
+            # Rows are tightly packed, they may not be 4 bytes aligned
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+            glTexImage2D(GL_TEXTURE_2D, 0, self.format, self.width, self.height, 0, self.format, GL_UNSIGNED_BYTE, None)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+            if self.mipmaps:
+                glGenerateMipmap(GL_TEXTURE_2D)
+
+            # The driver keeps the storage alive until the copy is finished
+            glDeleteBuffers(1, [self.pbo])
+            self.pbo = None
+            self.data = None
+            self.done = True
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        return self.done
+
+    def progress(self):
+        return 1.0 if self.done else self.nextRow / self.height
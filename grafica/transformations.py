@@ -6,60 +6,76 @@ import numpy as np
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
-def identity():
-    return np.identity(4, dtype=np.float32)
+# Every constructor accepts an optional out buffer. When given, the matrix is
+# written there instead of allocating a new one, so per-frame code can reuse
+# the same arrays:
+#     model = tr.identity()
+#     tr.translate(x, y, z, out=model)
 
+_IDENTITY = np.identity(4, dtype=np.float32)
 
-def uniformScale(s):
-    return np.array([
-        [s,0,0,0],
-        [0,s,0,0],
-        [0,0,s,0],
-        [0,0,0,1]], dtype = np.float32)
+
+def _output(out):
+    """Returns a fresh identity matrix, or resets the caller supplied 4x4 buffer to identity"""
+    if out is None:
+        return np.identity(4, dtype=np.float32)
+    out[...] = _IDENTITY
+    return out
+
+
+def identity(out=None):
+    return _output(out)
 
 
-def scale(sx, sy, sz):
-    return np.array([
-        [sx,0,0,0],
-        [0,sy,0,0],
-        [0,0,sz,0],
-        [0,0,0,1]], dtype = np.float32)
+def uniformScale(s, out=None):
+    return scale(s, s, s, out)
 
 
-def rotationX(theta):
+def scale(sx, sy, sz, out=None):
+    out = _output(out)
+    out[0, 0] = sx
+    out[1, 1] = sy
+    out[2, 2] = sz
+    return out
+
+
+def rotationX(theta, out=None):
     sin_theta = np.sin(theta)
     cos_theta = np.cos(theta)
 
-    return np.array([
-        [1,0,0,0],
-        [0,cos_theta,-sin_theta,0],
-        [0,sin_theta,cos_theta,0],
-        [0,0,0,1]], dtype = np.float32)
+    out = _output(out)
+    out[1, 1] = cos_theta
+    out[1, 2] = -sin_theta
+    out[2, 1] = sin_theta
+    out[2, 2] = cos_theta
+    return out
 
 
-def rotationY(theta):
+def rotationY(theta, out=None):
     sin_theta = np.sin(theta)
     cos_theta = np.cos(theta)
 
-    return np.array([
-        [cos_theta,0,sin_theta,0],
-        [0,1,0,0],
-        [-sin_theta,0,cos_theta,0],
-        [0,0,0,1]], dtype = np.float32)
+    out = _output(out)
+    out[0, 0] = cos_theta
+    out[0, 2] = sin_theta
+    out[2, 0] = -sin_theta
+    out[2, 2] = cos_theta
+    return out
 
 
-def rotationZ(theta):
+def rotationZ(theta, out=None):
     sin_theta = np.sin(theta)
     cos_theta = np.cos(theta)
 
-    return np.array([
-        [cos_theta,-sin_theta,0,0],
-        [sin_theta,cos_theta,0,0],
-        [0,0,1,0],
-        [0,0,0,1]], dtype = np.float32)
+    out = _output(out)
+    out[0, 0] = cos_theta
+    out[0, 1] = -sin_theta
+    out[1, 0] = sin_theta
+    out[1, 1] = cos_theta
+    return out
 
 
-def rotationA(theta, axis):
+def rotationA(theta, axis, out=None):
     s = np.sin(theta)
     c = np.cos(theta)
 
@@ -69,139 +85,113 @@ def rotationA(theta, axis):
     y = axis[1]
     z = axis[2]
 
-    return np.array([
-        # First row
-        [c + (1 - c) * x * x,
-        (1 - c) * x * y - s * z,
-        (1 - c) * x * z + s * y,
-        0],
-        # Second row
-        [(1 - c) * x * y + s * z,
-        c + (1 - c) * y * y,
-        (1 - c) * y * z - s * x,
-        0],
-        # Third row
-        [(1 - c) * x * z - s * y,
-        (1 - c) * y * z + s * x,
-        c + (1 - c) * z * z,
-        0],
-        # Fourth row
-        [0,0,0,1]], dtype = np.float32)
-
-def rotationAxis(theta, point1, point2):
+    out = _output(out)
+    # First row
+    out[0, 0] = c + (1 - c) * x * x
+    out[0, 1] = (1 - c) * x * y - s * z
+    out[0, 2] = (1 - c) * x * z + s * y
+    # Second row
+    out[1, 0] = (1 - c) * x * y + s * z
+    out[1, 1] = c + (1 - c) * y * y
+    out[1, 2] = (1 - c) * y * z - s * x
+    # Third row
+    out[2, 0] = (1 - c) * x * z - s * y
+    out[2, 1] = (1 - c) * y * z + s * x
+    out[2, 2] = c + (1 - c) * z * z
+    return out
+
+def rotationAxis(theta, point1, point2, out=None):
     axis = point2-point1
     axis = axis / np.linalg.norm(axis)
-    a,b,c = axis
-    h = np.sqrt(a**2 + c**2)
-
-    T = translate(-point1[0], -point1[1], -point1[2])
-    Tinv = translate(point1[0], point1[1], point1[2])
-
-    Ry = np.array([
-        [a/h, 0, c/h, 0],
-        [0,1,0,0],
-        [-c/h, 0, a/h, 0],
-        [0,0,0,1]], dtype=np.float32)
-    
-    Ryinv = np.array([
-        [a/h, 0, -c/h, 0],
-        [0,1,0,0],
-        [c/h, 0, a/h, 0],
-        [0,0,0,1]], dtype=np.float32)
-    
-    Rz = np.array([
-        [h, b, 0, 0],
-        [-b, h, 0, 0],
-        [0,0,1,0],
-        [0,0,0,1]], dtype=np.float32)
-    
-    Rzinv = np.array([
-        [h, -b, 0, 0],
-        [b, h, 0, 0],
-        [0,0,1,0],
-        [0,0,0,1]], dtype=np.float32)
-    
-    Rx = rotationX(theta)
-
-    return matmul([Tinv,Ryinv,Rzinv,Rx,Rz,Ry,T])
-    
-def translate(tx, ty, tz):
-    return np.array([
-        [1,0,0,tx],
-        [0,1,0,ty],
-        [0,0,1,tz],
-        [0,0,0,1]], dtype = np.float32)
-
-
-def shearing(xy, yx, xz, zx, yz, zy):
-    return np.array([
-        [ 1, xy, xz, 0],
-        [yx,  1, yz, 0],
-        [zx, zy,  1, 0],
-        [ 0,  0,  0, 1]], dtype = np.float32)
-
-
-def matmul(mats):
-    out = mats[0]
-    for i in range(1, len(mats)):
-        out = np.matmul(out, mats[i])
 
+    # Same as translate(point1) @ rotationA(theta, axis) @ translate(-point1),
+    # the translation is folded directly instead of chaining matrix products
+    out = rotationA(theta, axis, out)
+    out[:3, 3] = point1 - np.matmul(out[:3, :3], point1)
+    return out
+
+
+def translate(tx, ty, tz, out=None):
+    out = _output(out)
+    out[0, 3] = tx
+    out[1, 3] = ty
+    out[2, 3] = tz
+    return out
+
+
+def shearing(xy, yx, xz, zx, yz, zy, out=None):
+    out = _output(out)
+    out[0, 1] = xy
+    out[0, 2] = xz
+    out[1, 0] = yx
+    out[1, 2] = yz
+    out[2, 0] = zx
+    out[2, 1] = zy
     return out
 
 
-def frustum(left, right, bottom, top, near, far):
+def matmul(mats, out=None):
+    """Composes mats from left to right.
+    If out is given, the product is written there without allocating new matrices.
+    out may be mats[0] or mats[1], but not any of the following ones."""
+    if out is None:
+        out = mats[0]
+        for i in range(1, len(mats)):
+            out = np.matmul(out, mats[i])
+
+        return out
+
+    if len(mats) == 1:
+        out[...] = mats[0]
+        return out
+
+    # NumPy resolves the overlap when out is also one of the first two operands
+    np.matmul(mats[0], mats[1], out=out)
+    for i in range(2, len(mats)):
+        np.matmul(out, mats[i], out=out)
+
+    return out
+
+
+def frustum(left, right, bottom, top, near, far, out=None):
     r_l = right - left
     t_b = top - bottom
     f_n = far - near
-    return np.array([
-        [ 2 * near / r_l,
-        0,
-        (right + left) / r_l,
-        0],
-        [ 0,
-        2 * near / t_b,
-        (top + bottom) / t_b,
-        0],
-        [ 0,
-        0,
-        -(far + near) / f_n,
-        -2 * near * far / f_n],
-        [ 0,
-        0,
-        -1,
-        0]], dtype = np.float32)
-
-
-def perspective(fovy, aspect, near, far):
+
+    out = _output(out)
+    out[0, 0] = 2 * near / r_l
+    out[0, 2] = (right + left) / r_l
+    out[1, 1] = 2 * near / t_b
+    out[1, 2] = (top + bottom) / t_b
+    out[2, 2] = -(far + near) / f_n
+    out[2, 3] = -2 * near * far / f_n
+    out[3, 2] = -1
+    out[3, 3] = 0
+    return out
+
+
+def perspective(fovy, aspect, near, far, out=None):
     halfHeight = np.tan(np.pi * fovy / 360) * near
     halfWidth = halfHeight * aspect
-    return frustum(-halfWidth, halfWidth, -halfHeight, halfHeight, near, far)
+    return frustum(-halfWidth, halfWidth, -halfHeight, halfHeight, near, far, out)
 
 
-def ortho(left, right, bottom, top, near, far):
+def ortho(left, right, bottom, top, near, far, out=None):
     r_l = right - left
     t_b = top - bottom
     f_n = far - near
-    return np.array([
-        [ 2 / r_l,
-        0,
-        0,
-        -(right + left) / r_l],
-        [ 0,
-        2 / t_b,
-        0,
-        -(top + bottom) / t_b],
-        [ 0,
-        0,
-        -2 / f_n,
-        -(far + near) / f_n],
-        [ 0,
-        0,
-        0,
-        1]], dtype = np.float32)
-
-
-def lookAt(eye, at, up):
+
+    out = _output(out)
+    out[0, 0] = 2 / r_l
+    out[0, 3] = -(right + left) / r_l
+    out[1, 1] = 2 / t_b
+    out[1, 3] = -(top + bottom) / t_b
+    out[2, 2] = -2 / f_n
+    out[2, 3] = -(far + near) / f_n
+    return out
+
+
+def lookAt(eye, at, up, out=None):
 
     forward = (at - eye)
     forward = forward / np.linalg.norm(forward)
@@ -212,9 +202,266 @@ def lookAt(eye, at, up):
     newUp = np.cross(side, forward)
     newUp = newUp / np.linalg.norm(newUp)
 
-    return np.array([
-            [side[0],       side[1],    side[2], -np.dot(side, eye)],
-            [newUp[0],     newUp[1],   newUp[2], -np.dot(newUp, eye)],
-            [-forward[0], -forward[1], -forward[2], np.dot(forward, eye)],
-            [0,0,0,1]
-        ], dtype = np.float32)
+    out = _output(out)
+    out[0, :3] = side
+    out[1, :3] = newUp
+    out[2, :3] = -forward
+    out[0, 3] = -np.dot(side, eye)
+    out[1, 3] = -np.dot(newUp, eye)
+    out[2, 3] = np.dot(forward, eye)
+    return out
+
+
+# Batched versions of the constructors above.
+# Every parameter may be a scalar or an array, all of them are broadcasted
+# against each other and the result is a stack of shape (..., 4, 4).
+# E.g. batchTranslate(xs, 0, zs) with xs.shape == zs.shape == (N,) returns (N, 4, 4)
+
+def _batchArgs(*args):
+    args = np.broadcast_arrays(*[np.asarray(arg, dtype=np.float32) for arg in args])
+    return args, args[0].shape
+
+
+def _batchOutput(shape, out):
+    """Returns a zeroed (..., 4, 4) stack, reusing the caller supplied buffer if any"""
+    if out is None:
+        return np.zeros(shape + (4, 4), dtype=np.float32)
+    assert out.shape == shape + (4, 4)
+    out[...] = 0
+    return out
+
+
+def batchIdentity(n, out=None):
+    if out is None:
+        return np.broadcast_to(_IDENTITY, (n, 4, 4)).copy()
+    out[...] = _IDENTITY
+    return out
+
+
+def batchUniformScale(s, out=None):
+    return batchScale(s, s, s, out)
+
+
+def batchScale(sx, sy, sz, out=None):
+    (sx, sy, sz), shape = _batchArgs(sx, sy, sz)
+    out = _batchOutput(shape, out)
+    out[..., 0, 0] = sx
+    out[..., 1, 1] = sy
+    out[..., 2, 2] = sz
+    out[..., 3, 3] = 1
+    return out
+
+
+def batchTranslate(tx, ty, tz, out=None):
+    (tx, ty, tz), shape = _batchArgs(tx, ty, tz)
+    out = _batchOutput(shape, out)
+    out[..., 0, 0] = 1
+    out[..., 1, 1] = 1
+    out[..., 2, 2] = 1
+    out[..., 3, 3] = 1
+    out[..., 0, 3] = tx
+    out[..., 1, 3] = ty
+    out[..., 2, 3] = tz
+    return out
+
+
+def batchRotationX(theta, out=None):
+    (theta,), shape = _batchArgs(theta)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+
+    out = _batchOutput(shape, out)
+    out[..., 0, 0] = 1
+    out[..., 1, 1] = cos_theta
+    out[..., 1, 2] = -sin_theta
+    out[..., 2, 1] = sin_theta
+    out[..., 2, 2] = cos_theta
+    out[..., 3, 3] = 1
+    return out
+
+
+def batchRotationY(theta, out=None):
+    (theta,), shape = _batchArgs(theta)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+
+    out = _batchOutput(shape, out)
+    out[..., 0, 0] = cos_theta
+    out[..., 0, 2] = sin_theta
+    out[..., 1, 1] = 1
+    out[..., 2, 0] = -sin_theta
+    out[..., 2, 2] = cos_theta
+    out[..., 3, 3] = 1
+    return out
+
+
+def batchRotationZ(theta, out=None):
+    (theta,), shape = _batchArgs(theta)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+
+    out = _batchOutput(shape, out)
+    out[..., 0, 0] = cos_theta
+    out[..., 0, 1] = -sin_theta
+    out[..., 1, 0] = sin_theta
+    out[..., 1, 1] = cos_theta
+    out[..., 2, 2] = 1
+    out[..., 3, 3] = 1
+    return out
+
+
+def batchRotationA(theta, axis, out=None):
+    """axis may be a single (3,) unit vector or a (..., 3) array of unit vectors"""
+    axis = np.asarray(axis, dtype=np.float32)
+    assert axis.shape[-1] == 3
+
+    (theta, x, y, z), shape = _batchArgs(theta, axis[..., 0], axis[..., 1], axis[..., 2])
+    s = np.sin(theta)
+    c = np.cos(theta)
+    t = 1 - c
+
+    out = _batchOutput(shape, out)
+    out[..., 0, 0] = c + t * x * x
+    out[..., 0, 1] = t * x * y - s * z
+    out[..., 0, 2] = t * x * z + s * y
+    out[..., 1, 0] = t * x * y + s * z
+    out[..., 1, 1] = c + t * y * y
+    out[..., 1, 2] = t * y * z - s * x
+    out[..., 2, 0] = t * x * z - s * y
+    out[..., 2, 1] = t * y * z + s * x
+    out[..., 2, 2] = c + t * z * z
+    out[..., 3, 3] = 1
+    return out
+
+
+def batchLookAt(eye, at, up, out=None):
+    """eye, at and up may be (3,) vectors or (..., 3) arrays of vectors"""
+    eye, at, up = np.broadcast_arrays(
+        np.asarray(eye, dtype=np.float32),
+        np.asarray(at, dtype=np.float32),
+        np.asarray(up, dtype=np.float32))
+
+    forward = at - eye
+    forward = forward / np.linalg.norm(forward, axis=-1, keepdims=True)
+
+    side = np.cross(forward, up)
+    side = side / np.linalg.norm(side, axis=-1, keepdims=True)
+
+    newUp = np.cross(side, forward)
+    newUp = newUp / np.linalg.norm(newUp, axis=-1, keepdims=True)
+
+    out = _batchOutput(eye.shape[:-1], out)
+    out[..., 0, :3] = side
+    out[..., 1, :3] = newUp
+    out[..., 2, :3] = -forward
+    out[..., 0, 3] = -np.sum(side * eye, axis=-1)
+    out[..., 1, 3] = -np.sum(newUp * eye, axis=-1)
+    out[..., 2, 3] = np.sum(forward * eye, axis=-1)
+    out[..., 3, 3] = 1
+    return out
+
+
+def batchMatmul(mats, out=None):
+    """Composes a list of (4, 4) matrices and/or (..., 4, 4) stacks, broadcasting single matrices"""
+    if out is not None:
+        return matmul(mats, out)
+
+    out = np.asarray(mats[0], dtype=np.float32)
+    for i in range(1, len(mats)):
+        out = np.matmul(out, mats[i])
+
+    return out
+
+
+# Inverses of affine transforms, M = [A t; 0 1].
+# They avoid a general 4x4 inversion by working only on the 3x3 block A.
+# All of them accept a single (4, 4) matrix or a (..., 4, 4) stack.
+
+_NEXT = [1, 2, 0]
+_PREVIOUS = [2, 0, 1]
+
+
+def _cofactors(A):
+    """Cofactor matrix of a (..., 3, 3) stack and its determinant.
+    The cofactor matrix equals det(A) * inverse(A).T"""
+    a = A[..., _NEXT, :]
+    b = A[..., _PREVIOUS, :]
+    cofactors = a[..., _NEXT] * b[..., _PREVIOUS] - a[..., _PREVIOUS] * b[..., _NEXT]
+    det = np.sum(A[..., 0, :] * cofactors[..., 0, :], axis=-1)
+    return cofactors, det
+
+
+def _singleInverseRows(M):
+    """Inverse of the linear part of a single matrix as a list of rows.
+    For one matrix, plain Python floats are faster than a dozen small NumPy calls"""
+    (a, b, c, _), (d, e, f, _), (g, h, i, _), _ = M.tolist()
+    invDet = 1.0 / (a * (e * i - f * h) + b * (f * g - d * i) + c * (d * h - e * g))
+    return [
+        [(e * i - f * h) * invDet, (c * h - b * i) * invDet, (b * f - c * e) * invDet],
+        [(f * g - d * i) * invDet, (a * i - c * g) * invDet, (c * d - a * f) * invDet],
+        [(d * h - e * g) * invDet, (b * g - a * h) * invDet, (a * e - b * d) * invDet]]
+
+
+def _inverseTranslation(inverseA, t):
+    return [-(row[0] * t[0] + row[1] * t[1] + row[2] * t[2]) for row in inverseA]
+
+
+def _affineOutput(M, out):
+    if out is None:
+        out = np.empty(M.shape, dtype=np.float32)
+    out[..., 3, :3] = 0
+    out[..., 3, 3] = 1
+    return out
+
+
+def rigidInverse(M, out=None):
+    """Inverse of a rotation + translation transform: [R^T, -R^T t]"""
+    M = np.asarray(M, dtype=np.float32)
+    Rt = np.swapaxes(M[..., :3, :3], -1, -2)
+    t = M[..., :3, 3]
+
+    # Rt and t are views of M: both results are computed before writing, so out may be M
+    if M.ndim == 2:
+        translation = _inverseTranslation(Rt.tolist(), t.tolist())
+    else:
+        translation = -np.matmul(Rt, t[..., None])[..., 0]
+    rotation = Rt.copy()
+
+    out = _affineOutput(M, out)
+    out[..., :3, :3] = rotation
+    out[..., :3, 3] = translation
+    return out
+
+
+def affineInverse(M, out=None):
+    """Inverse of any invertible affine transform: [A^-1, -A^-1 t]"""
+    M = np.asarray(M, dtype=np.float32)
+    out = _affineOutput(M, out)
+
+    if M.ndim == 2:
+        inverseA = _singleInverseRows(M)
+        out[:3, :3] = inverseA
+        out[:3, 3] = _inverseTranslation(inverseA, M[:3, 3].tolist())
+        return out
+
+    cofactors, det = _cofactors(M[..., :3, :3])
+    inverseA = np.swapaxes(cofactors, -1, -2) / det[..., None, None]
+    out[..., :3, :3] = inverseA
+    out[..., :3, 3] = -np.matmul(inverseA, M[..., :3, 3, None])[..., 0]
+    return out
+
+
+def normalMatrix(M, out=None):
+    """3x3 inverse-transpose of the linear part of M, used to transform normals.
+    It is the matrix the shaders compute as mat3(transpose(inverse(model)))"""
+    M = np.asarray(M, dtype=np.float32)
+    if out is None:
+        out = np.empty(M.shape[:-2] + (3, 3), dtype=np.float32)
+
+    if M.ndim == 2:
+        out[...] = list(zip(*_singleInverseRows(M)))
+        return out
+
+    cofactors, det = _cofactors(M[..., :3, :3])
+    np.divide(cofactors, det[..., None, None], out=out)
+    return out